@@ -0,0 +1,247 @@
+"""
+Per-tenant admission control for the expensive endpoints.
+
+Every (tenant, route budget) pair gets
+- a token bucket (sustained rate + burst), charged per request; exhausting it
+  returns 429 with Retry-After. A request costing more than the burst is let
+  through on a full bucket but charged in full, leaving the bucket in debt,
+- a concurrency cap; requests over the cap wait in a queue, but only while the
+  expected wait stays under the budget's latency target. Otherwise the request
+  is shed with 503 and Retry-After instead of adding to everyone's latency.
+
+Usage on a route:
+
+    @router.post("/analyze", dependencies=[Depends(admission.limit("analyze"))])
+
+Long-lived connections (the fraud scoring WebSocket) hold one concurrency slot
+while open (try_acquire_slot / release_slot) and charge() the bucket per batch.
+Routes that only learn their cost from the body (analyze-batch is charged per
+packet entry) use limit(route, charge_per_request=False) and call
+charge_or_reject().
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from auth import get_current_user
+import metrics
+import models
+
+
+class RouteBudget:
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_concurrency: int,
+        latency_target: float,
+        cost_per_mb: float = 0.0,
+    ):
+        self.rate = rate  # tokens refilled per second
+        self.burst = burst  # bucket capacity
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target  # max acceptable queue wait (s)
+        self.cost_per_mb = cost_per_mb  # extra tokens per MB of request body
+
+
+ROUTE_BUDGETS: Dict[str, RouteBudget] = {
+    "analyze": RouteBudget(rate=2.0, burst=20, max_concurrency=4, latency_target=5.0, cost_per_mb=1.0),
+    "summarize": RouteBudget(rate=2.0, burst=20, max_concurrency=4, latency_target=5.0, cost_per_mb=1.0),
+    "fraud_score": RouteBudget(rate=50.0, burst=200, max_concurrency=16, latency_target=0.5),
+}
+
+metrics.describe("admission_requests_total", "Admission decisions per route budget and tenant.")
+metrics.describe("admission_queue_wait_seconds", "Time spent waiting for a concurrency slot.")
+metrics.describe("admission_in_flight", "Admitted requests currently running.")
+metrics.describe("admission_queued", "Requests currently waiting for a concurrency slot.")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_take(self, cost: float) -> Tuple[bool, float]:
+        """Returns (taken, seconds until `cost` tokens are available)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        # An oversized request gets through on a full bucket, but pays in full
+        # (tokens go negative and later requests wait until the debt is repaid)
+        required = min(cost, self.burst)
+        if self.tokens >= required:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (required - self.tokens) / self.rate
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class TenantLane:
+    """Rate limit, concurrency slots and queue state of one tenant on one route budget."""
+
+    def __init__(self, budget: RouteBudget):
+        self.budget = budget
+        self.bucket = TokenBucket(budget.rate, budget.burst)
+        self.slots = asyncio.Semaphore(budget.max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        # Exponentially weighted average service time, for queue wait estimates
+        self.avg_service_time = 0.0
+
+
+_lanes: Dict[Tuple[int, str], TenantLane] = {}
+
+
+def _lane(tenant_id: int, route: str) -> TenantLane:
+    lane = _lanes.get((tenant_id, route))
+    if lane is None:
+        lane = _lanes[(tenant_id, route)] = TenantLane(ROUTE_BUDGETS[route])
+    return lane
+
+
+def _retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+def _reject(status_code: int, detail: str, retry_after: float, route: str, tenant_id: int, outcome: str):
+    metrics.inc("admission_requests_total", route=route, tenant=tenant_id, outcome=outcome)
+    raise HTTPException(status_code=status_code, detail=detail, headers=_retry_after_header(retry_after))
+
+
+def _request_cost(request: Request, budget: RouteBudget, units: float = 1.0) -> float:
+    try:
+        size = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        size = 0
+    return units + budget.cost_per_mb * size / (1024 * 1024)
+
+
+def charge(tenant_id: int, route: str, cost: float) -> float:
+    """Takes `cost` tokens from the tenant's bucket. Returns 0, or the seconds to wait if rate limited."""
+    taken, retry_after = _lane(tenant_id, route).bucket.try_take(cost)
+    outcome = "admitted" if taken else "rate_limited"
+    metrics.inc("admission_requests_total", route=route, tenant=tenant_id, outcome=outcome)
+    return 0.0 if taken else retry_after
+
+
+def charge_or_reject(request: Request, tenant_id: int, route: str, units: float) -> None:
+    """
+    Charges a request as `units` requests plus its body size, from the
+    handler of a limit(route, charge_per_request=False) route. Raises 429
+    with Retry-After when rate limited.
+    """
+    retry_after = charge(tenant_id, route, _request_cost(request, ROUTE_BUDGETS[route], units))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded for this tenant.",
+            headers=_retry_after_header(retry_after),
+        )
+
+
+async def try_acquire_slot(tenant_id: int, route: str) -> bool:
+    """Takes a concurrency slot without queueing; False if all are in use."""
+    lane = _lane(tenant_id, route)
+    if lane.slots.locked():
+        metrics.inc("admission_requests_total", route=route, tenant=tenant_id, outcome="shed")
+        return False
+    await lane.slots.acquire()
+    lane.in_flight += 1
+    metrics.set_gauge("admission_in_flight", lane.in_flight, route=route, tenant=tenant_id)
+    return True
+
+
+def release_slot(tenant_id: int, route: str) -> None:
+    lane = _lane(tenant_id, route)
+    lane.in_flight -= 1
+    lane.slots.release()
+    metrics.set_gauge("admission_in_flight", lane.in_flight, route=route, tenant=tenant_id)
+
+
+def limit(route: str, charge_per_request: bool = True):
+    """
+    FastAPI dependency enforcing the `route` budget for the current user's
+    tenant. With charge_per_request=False only the concurrency cap applies
+    and the handler charges the bucket itself (charge_or_reject).
+    """
+    if route not in ROUTE_BUDGETS:
+        raise ValueError(f"Unknown route budget: {route}")
+
+    async def admit(request: Request, current_user: models.User = Depends(get_current_user)):
+        tenant_id = current_user.tenant_id
+        lane = _lane(tenant_id, route)
+        budget = lane.budget
+
+        cost = _request_cost(request, budget) if charge_per_request else 0.0
+        taken, retry_after = lane.bucket.try_take(cost)
+        if not taken:
+            _reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Rate limit exceeded for this tenant.",
+                retry_after,
+                route,
+                tenant_id,
+                "rate_limited",
+            )
+
+        # Fail fast when the expected queue wait exceeds the latency target
+        if lane.in_flight >= budget.max_concurrency:
+            expected_wait = (lane.queued + 1) * lane.avg_service_time / budget.max_concurrency
+            if expected_wait > budget.latency_target:
+                lane.bucket.refund(cost)
+                _reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Server is busy for this tenant, retry later.",
+                    expected_wait,
+                    route,
+                    tenant_id,
+                    "shed",
+                )
+
+        queued_at = time.monotonic()
+        lane.queued += 1
+        metrics.set_gauge("admission_queued", lane.queued, route=route, tenant=tenant_id)
+        try:
+            await asyncio.wait_for(lane.slots.acquire(), timeout=budget.latency_target)
+        except asyncio.TimeoutError:
+            lane.bucket.refund(cost)
+            _reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Server is busy for this tenant, retry later.",
+                lane.avg_service_time or budget.latency_target,
+                route,
+                tenant_id,
+                "shed",
+            )
+        finally:
+            lane.queued -= 1
+            metrics.set_gauge("admission_queued", lane.queued, route=route, tenant=tenant_id)
+
+        started = time.monotonic()
+        metrics.observe("admission_queue_wait_seconds", started - queued_at, route=route)
+        if charge_per_request:
+            # Otherwise the handler's charge() records the decision
+            metrics.inc("admission_requests_total", route=route, tenant=tenant_id, outcome="admitted")
+        lane.in_flight += 1
+        metrics.set_gauge("admission_in_flight", lane.in_flight, route=route, tenant=tenant_id)
+        try:
+            yield
+        finally:
+            lane.in_flight -= 1
+            lane.slots.release()
+            elapsed = time.monotonic() - started
+            lane.avg_service_time = (
+                elapsed if lane.avg_service_time == 0.0 else 0.8 * lane.avg_service_time + 0.2 * elapsed
+            )
+            metrics.set_gauge("admission_in_flight", lane.in_flight, route=route, tenant=tenant_id)
+
+    return admit
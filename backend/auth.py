@@ -10,12 +10,16 @@ from sqlalchemy.orm import Session
 from database import get_db
 import models
 import schemas
+import shared_cache
 
 # === JWT CONFIG ===
 SECRET_KEY = "SUPER_SECRET_CHANGE_ME"  # change in prod (env var)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
+# Authenticated users are cached across workers (see shared_cache.py)
+USER_CACHE_TTL_SECONDS = 300
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -40,25 +44,71 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def forget_cached_user(user_id: int) -> None:
+    shared_cache.delete("user", str(user_id))
+
+
+def get_cached_user(db: Session, user_id: int) -> Optional[models.User]:
+    """
+    Like get_user_by_id, but served from the shared cache when possible.
+    Cached users are detached (not bound to `db`) and read-only.
+    """
+    cached = shared_cache.get("user", str(user_id))
+    if cached is not None:
+        tenant = None
+        if cached["tenant_id"] is not None:
+            tenant = models.Tenant(id=cached["tenant_id"], name=cached["tenant_name"])
+        return models.User(
+            id=cached["id"],
+            email=cached["email"],
+            full_name=cached["full_name"],
+            hashed_password="",
+            is_active=cached["is_active"],
+            tenant_id=cached["tenant_id"],
+            tenant=tenant,
+        )
+
+    user = get_user_by_id(db, user_id)
+    if user is not None:
+        shared_cache.put(
+            "user",
+            str(user_id),
+            {
+                "id": user.id,
+                "email": user.email,
+                "full_name": user.full_name,
+                "is_active": user.is_active,
+                "tenant_id": user.tenant_id,
+                "tenant_name": user.tenant.name if user.tenant else None,
+            },
+            ttl=USER_CACHE_TTL_SECONDS,
+        )
+    return user
+
+
+def user_from_token(db: Session, token: str) -> Optional[models.User]:
+    """Decodes an access token and returns its user, or None if it is invalid."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: Optional[str] = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            return None
         token_data = schemas.TokenData(user_id=int(user_id))
     except (JWTError, ValueError):
-        raise credentials_exception
+        return None
+
+    return get_cached_user(db, token_data.user_id)
+
 
-    user = get_user_by_id(db, token_data.user_id)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> models.User:
+    user = user_from_token(db, token)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
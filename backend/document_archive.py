@@ -0,0 +1,341 @@
+"""
+Retention and cold archival for stored documents.
+
+Tenants with a retention policy keep only the last `hot_days` of documents in
+the `documents` table. Older rows are moved, oldest first, into append-only
+gzip NDJSON segment files, one file per compaction step:
+
+    ARCHIVE_DIR/tenant_<id>/segment_<first id>_<last id>.ndjson.gz
+
+A segment is written to a temporary file and linked into place (never over an
+existing segment) before its rows are deleted, so a crash never loses
+documents. Rows of a segment that was written but not deleted are removed the
+next time the tenant is compacted, if they still match the archived id and
+creation time. Document ids are AUTOINCREMENT, so archived ids are never reused
+by new documents; migrate_document_ids() converts older databases.
+
+Compaction runs as a background task in small steps (ARCHIVE_BATCH_SIZE rows
+per tenant) on a worker thread, each step in its own short transaction, so
+request paths are never blocked. With several workers (serve.py) only the one
+holding the archive lock compacts. Archived documents are only read on
+request (`include_archived=true`).
+
+    python document_archive.py compact    # archive everything due now
+"""
+
+import argparse
+import asyncio
+import fcntl
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+import document_export
+import models
+
+ARCHIVE_DIR = os.getenv("DOCUMENT_ARCHIVE_DIR", "./document_archive")
+ARCHIVE_BATCH_SIZE = 500
+# Seconds between compaction passes; 0 disables the background task
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_RE = re.compile(r"^segment_(\d+)_(\d+)\.ndjson\.gz$")
+
+# Tenants whose last segment has been checked for undeleted rows in this process
+_recovered: Set[int] = set()
+
+
+# --------- Segments ---------
+
+
+def tenant_archive_dir(tenant_id: int) -> str:
+    return os.path.join(ARCHIVE_DIR, f"tenant_{tenant_id}")
+
+
+def list_segments(tenant_id: int) -> List[Tuple[int, int, str]]:
+    """(first id, last id, path) of the tenant's segments, oldest first."""
+    directory = tenant_archive_dir(tenant_id)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    segments = []
+    for name in names:
+        match = _SEGMENT_RE.match(name)
+        if match:
+            segments.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def write_segment(tenant_id: int, docs: List[Dict]) -> str:
+    directory = tenant_archive_dir(tenant_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"segment_{docs[0]['id']}_{docs[-1]['id']}.ndjson.gz")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for doc in docs:
+                f.write((json.dumps(doc) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    try:
+        os.link(tmp_path, path)  # unlike a rename, fails if the segment already exists
+    finally:
+        os.remove(tmp_path)
+    return path
+
+
+def archived_high_water_mark() -> int:
+    """Highest document id in any tenant's archive (0 if nothing is archived)."""
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return 0
+    highest = 0
+    for name in names:
+        if name.startswith("tenant_") and name[len("tenant_"):].isdigit():
+            segments = list_segments(int(name[len("tenant_"):]))
+            if segments:
+                highest = max(highest, segments[-1][1])
+    return highest
+
+
+def iter_archived_documents(tenant_id: int) -> Iterator[Dict]:
+    """Archived document rows (same keys as document_export.EXPORT_COLUMNS), oldest first."""
+    for _, _, path in list_segments(tenant_id):
+        yield from read_segment(path)
+
+
+def iter_archived_chunks(tenant_id: int, chunk_size: int) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for doc in iter_archived_documents(tenant_id):
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --------- Policies ---------
+
+
+def get_policy(db: Session, tenant_id: int) -> Optional[models.DocumentRetentionPolicy]:
+    return (
+        db.query(models.DocumentRetentionPolicy)
+        .filter(models.DocumentRetentionPolicy.tenant_id == tenant_id)
+        .first()
+    )
+
+
+def set_policy(db: Session, tenant_id: int, hot_days: Optional[int]) -> None:
+    """Sets the tenant's retention (None removes it). The caller commits."""
+    policy = get_policy(db, tenant_id)
+    if hot_days is None:
+        if policy is not None:
+            db.delete(policy)
+        return
+    if policy is None:
+        db.add(models.DocumentRetentionPolicy(tenant_id=tenant_id, hot_days=hot_days))
+    else:
+        policy.hot_days = hot_days
+
+
+# --------- Compaction ---------
+
+
+def _delete_documents(db: Session, tenant_id: int, ids: List[int]) -> int:
+    deleted = (
+        db.query(models.Document)
+        .filter(models.Document.tenant_id == tenant_id, models.Document.id.in_(ids))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def _recover_last_segment(db: Session, tenant_id: int, cutoff: datetime) -> None:
+    """
+    Deletes hot rows already written to the last segment (crash between link
+    and delete): only rows that still match an archived (id, created_at) and
+    are past the cutoff.
+    """
+    segments = list_segments(tenant_id)
+    if segments:
+        archived = {doc["id"]: doc["created_at"] for doc in read_segment(segments[-1][2])}
+        rows = (
+            db.query(models.Document.id, models.Document.created_at)
+            .filter(
+                models.Document.tenant_id == tenant_id,
+                models.Document.id.in_(list(archived)),
+                or_(models.Document.created_at < cutoff, models.Document.created_at.is_(None)),
+            )
+            .all()
+        )
+        db.rollback()
+        ids = [
+            row.id
+            for row in rows
+            if (row.created_at.isoformat() if row.created_at else None) == archived[row.id]
+        ]
+        if ids:
+            _delete_documents(db, tenant_id, ids)
+    _recovered.add(tenant_id)
+
+
+def archive_step(db: Session, tenant_id: int, hot_days: int, now: datetime) -> int:
+    """Moves up to ARCHIVE_BATCH_SIZE of the tenant's oldest expired documents into a new segment."""
+    cutoff = now - timedelta(days=hot_days)
+    if tenant_id not in _recovered:
+        _recover_last_segment(db, tenant_id, cutoff)
+
+    rows = (
+        db.query(*document_export.EXPORT_COLUMNS.values())
+        .filter(
+            models.Document.tenant_id == tenant_id,
+            or_(models.Document.created_at < cutoff, models.Document.created_at.is_(None)),
+        )
+        .order_by(models.Document.id)
+        .limit(ARCHIVE_BATCH_SIZE)
+        .all()
+    )
+    db.rollback()  # do not hold the read transaction while writing the file
+    if not rows:
+        return 0
+
+    docs = document_export.document_rows(rows)
+    write_segment(tenant_id, docs)
+    return _delete_documents(db, tenant_id, [doc["id"] for doc in docs])
+
+
+def compact_step(now: Optional[datetime] = None) -> int:
+    """One archive step for every tenant with a policy. Returns the number of rows archived."""
+    now = now or datetime.utcnow()
+    db = SessionLocal()
+    try:
+        policies = db.query(
+            models.DocumentRetentionPolicy.tenant_id, models.DocumentRetentionPolicy.hot_days
+        ).all()
+        db.rollback()
+        return sum(archive_step(db, tenant_id, hot_days, now) for tenant_id, hot_days in policies)
+    finally:
+        db.close()
+
+
+def _acquire_compaction_lock():
+    """Returns the lock file if this process may compact, None if another one does."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    lock_file = open(os.path.join(ARCHIVE_DIR, ".compaction.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+async def run_compaction_loop(interval: float = ARCHIVE_INTERVAL_SECONDS) -> None:
+    """
+    Background task: archives expired documents step by step on a worker
+    thread, pausing between steps, then sleeps `interval` seconds.
+    """
+    lock_file = _acquire_compaction_lock()
+    if lock_file is None:
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                while await loop.run_in_executor(None, compact_step):
+                    await asyncio.sleep(0.1)
+            except Exception:
+                logger.exception("Document compaction failed, retrying in %ss", interval)
+            await asyncio.sleep(interval)
+    finally:
+        lock_file.close()
+
+
+# --------- Migration ---------
+
+
+def migrate_document_ids(bind: Engine = engine) -> None:
+    """
+    Rebuilds a `documents` table created without AUTOINCREMENT, whose ids
+    SQLite reuses once the highest rows are archived, and moves the id
+    sequence past every archived id. Runs once, at startup.
+    """
+    with bind.begin() as conn:
+        row = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'documents'")
+        ).first()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            return
+
+        conn.exec_driver_sql("BEGIN IMMEDIATE")  # pysqlite would run the DDL outside a transaction
+        # Explicit indexes move with the renamed table; the new table recreates them
+        indexes = conn.execute(
+            text(
+                "SELECT name FROM sqlite_master"
+                " WHERE type = 'index' AND tbl_name = 'documents' AND sql IS NOT NULL"
+            )
+        ).scalars().all()
+        for name in indexes:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql("ALTER TABLE documents RENAME TO documents_old")
+        models.Document.__table__.create(conn)
+        columns = ", ".join(column.name for column in models.Document.__table__.columns)
+        conn.exec_driver_sql(f"INSERT INTO documents ({columns}) SELECT {columns} FROM documents_old")
+        conn.exec_driver_sql("DROP TABLE documents_old")
+
+        highest = max(
+            archived_high_water_mark(),
+            conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM documents")).scalar(),
+        )
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'documents'"))
+        conn.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES ('documents', :seq)"), {"seq": highest}
+        )
+
+
+# --------- CLI ---------
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Document retention and archival")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compact", help="Archive all documents past their tenant's retention now")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        lock_file = _acquire_compaction_lock()
+        if lock_file is None:
+            raise SystemExit("Another process is compacting the archive.")
+        total = 0
+        with lock_file:
+            while True:
+                archived = compact_step()
+                if not archived:
+                    break
+                total += archived
+        print(f"Archived {total} documents into {ARCHIVE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+Offline asyncio load generator for the backend.
+
+Starts the app locally with uvicorn in a scratch directory (fresh SQLite DB),
+registers the scenario's tenants, then drives every configured route with
+open-loop Poisson arrivals at the requested rates using synthetic text/PDF
+documents and claims. Latency is measured from each request's *scheduled*
+start, so a stalled server shows up in the percentiles instead of silently
+lowering the offered load.
+
+    python loadtest.py loadtest_scenarios/smoke.json
+    python loadtest.py loadtest_scenarios/mixed.json --update-baseline
+    python loadtest.py loadtest_scenarios/mixed.json --url http://127.0.0.1:8000
+
+Results are compared with loadtest_baselines/<scenario>.json; the exit code is
+1 when a route's throughput, p95/p99 latency or error rate regresses past the
+tolerance, or when there is no baseline and --update-baseline was not given.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BACKEND_DIR, "loadtest_baselines")
+
+ROUTES = {
+    "login": ("POST", "/auth/login"),
+    "fraud_score": ("POST", "/fraud-detection/score"),
+    "analyze": ("POST", "/doc-classify/analyze"),
+    "summarize": ("POST", "/policy-summary/summarize"),
+}
+
+
+# --------- Latency histogram ---------
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of integer microsecond values: each power-of-two range
+    is split into 2**SUB_BUCKET_BITS linear sub-buckets, giving a bounded
+    relative error (< 2**-SUB_BUCKET_BITS, 0.8% with 7 bits) at constant
+    memory per magnitude.
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.total = 0
+        self.max_value = 0
+
+    def _key(self, value: int) -> Tuple[int, int]:
+        # Keep SUB_BUCKET_BITS bits below the leading one: 128 sub-buckets per power of two
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS - 1)
+        return shift, value >> shift
+
+    @staticmethod
+    def _highest_equivalent(key: Tuple[int, int]) -> int:
+        shift, sub = key
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1e6))
+        key = self._key(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.max_value = max(self.max_value, value)
+
+    def percentile(self, pct: float) -> float:
+        """Latency in milliseconds at `pct` (0-100)."""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(self.total * pct / 100.0))
+        seen = 0
+        for key in sorted(self.counts, key=self._highest_equivalent):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self._highest_equivalent(key), self.max_value) / 1000.0
+        return self.max_value / 1000.0
+
+    def distribution(self) -> List[Tuple[float, float]]:
+        """HDR-style percentile ladder: (percentile, value ms)."""
+        ladder = [0, 50, 75, 87.5, 90, 93.75, 95, 96.875, 98.4375, 99, 99.21875, 99.9, 99.99, 100]
+        return [(p, self.percentile(p)) for p in ladder]
+
+
+# --------- Synthetic fixtures ---------
+
+_CLAIM_WORDS = [
+    "car", "rear", "bumper", "damaged", "parking", "lot", "water", "leak", "kitchen",
+    "stolen", "phone", "fire", "minor", "collision", "road", "storm", "roof", "window",
+]
+
+
+def synthetic_document(kind: str, rng: random.Random) -> Tuple[List[str], str]:
+    """Returns (pages of lines, filename stem) for a document type of the mix."""
+    n = rng.randint(1000, 99999)
+    if kind == "invoice":
+        page = [
+            "TAX INVOICE",
+            f"Invoice No: INV-{n}",
+            f"Invoice Date: {rng.randint(1, 28)}/{rng.randint(1, 12)}/2024",
+            "Description of services: vehicle body repair and paint",
+            f"Subtotal: {n}.00",
+            "GST 18%",
+            f"Amount Due: {int(n * 1.18)}.00",
+        ]
+        pages = [page]
+    elif kind == "claim_form":
+        page = [
+            "CLAIM FORM",
+            f"Claim Number: CLM-{n}",
+            f"Policy Number: POL-{rng.randint(10000, 99999)}",
+            f"Loss Date: {rng.randint(1, 28)}/{rng.randint(1, 12)}/2024",
+            "Incident description: " + " ".join(rng.choice(_CLAIM_WORDS) for _ in range(25)),
+            "Insured signature: ____________",
+        ]
+        pages = [page]
+    elif kind == "policy":
+        pages = [
+            [
+                "POLICY SCHEDULE",
+                f"Sum Insured: {n * 100}",
+                "Coverage: comprehensive motor insurance including third party liability.",
+                "Premium payable annually. Endorsement applies to named drivers only.",
+            ]
+            + [
+                "Exclusions: wear and tear, mechanical breakdown, consequential loss, "
+                "driving under influence, unlicensed drivers. " * 2
+            ]
+            for _ in range(rng.randint(2, 6))
+        ]
+    else:  # letter
+        pages = [
+            [
+                "Dear Sir,",
+                "We refer to our earlier communication regarding the claim submitted last month.",
+                " ".join(rng.choice(_CLAIM_WORDS) for _ in range(60)),
+                "Regards,",
+                "Claims Department",
+            ]
+        ]
+    return pages, f"{kind}-{n}"
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Minimal multi-page PDF (Helvetica text) that pdfplumber can extract."""
+    n = len(pages)
+    page_ids = [4 + 2 * i for i in range(n)]
+    objects: Dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {n} >>".encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, lines in zip(page_ids, pages):
+        content = "BT /F1 10 Tf 12 TL 40 800 Td " + "".join(
+            f"({_pdf_escape(line)}) Tj T* " for line in lines
+        ) + "ET"
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = (
+            f"<< /Length {len(content)} >>\nstream\n{content}\nendstream"
+        ).encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n"
+
+    xref_at = len(out)
+    size = len(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for obj_id in sorted(objects):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def build_fixtures(scenario: Dict[str, Any], rng: random.Random, count: int = 50) -> List[Tuple[str, bytes, str]]:
+    """(filename, content, content type) samples following the scenario's document mix."""
+    mix = scenario.get("document_mix", {"invoice": 1.0})
+    kinds, weights = zip(*mix.items())
+    pdf_fraction = scenario.get("pdf_fraction", 0.3)
+
+    fixtures = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        pages, stem = synthetic_document(kind, rng)
+        if rng.random() < pdf_fraction:
+            fixtures.append((f"{stem}.pdf", make_pdf(pages), "application/pdf"))
+        else:
+            text = "\n\n".join("\n".join(lines) for lines in pages)
+            fixtures.append((f"{stem}.txt", text.encode(), "text/plain"))
+    return fixtures
+
+
+def synthetic_claim(rng: random.Random, seq: int, claimants: int) -> Dict[str, Any]:
+    return {
+        "claim_id": f"LT-{seq}",
+        "claimant_id": f"C-{rng.randint(1, claimants)}",
+        "amount": round(rng.lognormvariate(10, 1.2), 2),
+        "description": " ".join(rng.choice(_CLAIM_WORDS) for _ in range(rng.randint(6, 30))),
+        "is_third_party": rng.random() < 0.2,
+    }
+
+
+# --------- Local server ---------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_local_server(workdir: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", BACKEND_DIR,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--log-level", "warning",
+        ],
+        cwd=workdir,
+    )
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            if proc.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                await client.get(url + "/")
+                return proc, url
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Server did not start in time")
+
+
+# --------- Load generation ---------
+
+
+class RouteStats:
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.statuses: Dict[str, int] = {}
+        self.ok = 0
+        self.sent = 0
+
+    def record(self, status: str, latency: float) -> None:
+        self.sent += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status.startswith("2"):
+            self.ok += 1
+            self.histogram.record(latency)
+
+
+async def setup_tenants(client: httpx.AsyncClient, scenario: Dict[str, Any]) -> List[Dict[str, str]]:
+    users = []
+    run_id = int(time.time())
+    for t in range(scenario.get("tenants", 1)):
+        email = f"loadtest-{run_id}-{t}@example.com"
+        password = "loadtest-password"
+        r = await client.post(
+            "/auth/register",
+            json={"email": email, "password": password, "tenant_name": f"loadtest-{run_id}-{t}"},
+        )
+        r.raise_for_status()
+        r = await client.post("/auth/login", json={"email": email, "password": password})
+        r.raise_for_status()
+        users.append({"email": email, "password": password, "token": r.json()["access_token"]})
+    return users
+
+
+async def run_scenario(url: str, scenario: Dict[str, Any]) -> Dict[str, RouteStats]:
+    rng = random.Random(scenario.get("seed", 0))
+    fixtures = build_fixtures(scenario, rng)
+    duration = float(scenario.get("duration_seconds", 10))
+    warmup = float(scenario.get("warmup_seconds", 0))
+    in_flight = asyncio.Semaphore(scenario.get("max_in_flight", 64))
+    claimants = scenario.get("claimants_per_tenant", 200)
+    limits = httpx.Limits(max_connections=scenario.get("max_in_flight", 64))
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+        users = await setup_tenants(client, scenario)
+        stats = {route: RouteStats() for route in scenario["routes"]}
+        seq = 0
+
+        async def send(route: str, scheduled: float, measured: bool) -> None:
+            nonlocal seq
+            seq += 1
+            user = rng.choice(users)
+            headers = {"Authorization": f"Bearer {user['token']}"}
+            _, path = ROUTES[route]
+            async with in_flight:
+                try:
+                    if route == "login":
+                        r = await client.post(path, json={"email": user["email"], "password": user["password"]})
+                    elif route == "fraud_score":
+                        r = await client.post(path, json=synthetic_claim(rng, seq, claimants), headers=headers)
+                    else:
+                        filename, content, content_type = rng.choice(fixtures)
+                        r = await client.post(
+                            path,
+                            files={"file": (filename, content, content_type)},
+                            params=scenario["routes"][route].get("params"),
+                            headers=headers,
+                        )
+                    status = str(r.status_code)
+                except httpx.HTTPError as exc:
+                    status = type(exc).__name__
+            if measured:
+                stats[route].record(status, time.perf_counter() - scheduled)
+
+        async def drive(route: str, rate: float, start: float) -> None:
+            tasks = []
+            next_at = start
+            while True:
+                next_at += rng.expovariate(rate)
+                if next_at - start > warmup + duration:
+                    break
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                measured = next_at - start >= warmup
+                tasks.append(asyncio.create_task(send(route, next_at, measured)))
+            await asyncio.gather(*tasks)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(drive(route, float(cfg["rate"]), start) for route, cfg in scenario["routes"].items())
+        )
+    return stats
+
+
+# --------- Reporting and regression gate ---------
+
+
+def summarize(stats: Dict[str, RouteStats], duration: float) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for route, s in stats.items():
+        errors = s.sent - s.ok
+        summary[route] = {
+            "requests": s.sent,
+            "throughput_rps": round(s.ok / duration, 2),
+            "error_rate": round(errors / s.sent, 4) if s.sent else 0.0,
+            "p50_ms": round(s.histogram.percentile(50), 2),
+            "p95_ms": round(s.histogram.percentile(95), 2),
+            "p99_ms": round(s.histogram.percentile(99), 2),
+            "max_ms": round(s.histogram.max_value / 1000.0, 2),
+            "statuses": s.statuses,
+        }
+    return summary
+
+
+def print_report(stats: Dict[str, RouteStats], summary: Dict[str, Dict[str, Any]], show_histograms: bool) -> None:
+    print(f"\n{'route':<12} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'maxms':>9}  statuses")
+    for route, row in summary.items():
+        print(
+            f"{route:<12} {row['requests']:>7} {row['throughput_rps']:>8.2f} {row['error_rate'] * 100:>6.2f} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}  {row['statuses']}"
+        )
+
+    if show_histograms:
+        for route, s in stats.items():
+            print(f"\n{route} latency distribution (ms)\n{'percentile':>12} {'value':>10}")
+            for pct, value in s.histogram.distribution():
+                print(f"{pct:>12.5f} {value:>10.2f}")
+
+
+def compare_with_baseline(
+    summary: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Returns a list of regressions (empty when within tolerance)."""
+    regressions = []
+    for route, base in baseline.items():
+        current = summary.get(route)
+        if current is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{route}: {metric} {current[metric]} > baseline {base[metric]} (+{tolerance:.0%})")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{route}: throughput {current['throughput_rps']} rps < baseline {base['throughput_rps']} (-{tolerance:.0%})"
+            )
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{route}: error rate {current['error_rate']:.2%} > baseline {base['error_rate']:.2%} + 1%")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the backend and gate on a latency baseline")
+    parser.add_argument("scenario", help="Scenario JSON file")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--baseline", default=None, help="Baseline file (default loadtest_baselines/<scenario>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None, help="Allowed relative regression (default from scenario or 0.25)")
+    parser.add_argument("--output", default=None, help="Write the JSON summary here")
+    parser.add_argument("--histograms", action="store_true", help="Print full latency distributions")
+    args = parser.parse_args()
+
+    with open(args.scenario, "r", encoding="utf-8") as f:
+        scenario = json.load(f)
+    unknown = set(scenario["routes"]) - set(ROUTES)
+    if unknown:
+        raise SystemExit(f"Unknown routes in scenario: {', '.join(sorted(unknown))}")
+
+    name = scenario.get("name") or os.path.splitext(os.path.basename(args.scenario))[0]
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{name}.json")
+    tolerance = args.tolerance if args.tolerance is not None else scenario.get("tolerance", 0.25)
+    if not args.update_baseline and not os.path.exists(baseline_path):
+        raise SystemExit(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+
+    async def run() -> Dict[str, RouteStats]:
+        if args.url:
+            return await run_scenario(args.url, scenario)
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+            proc, url = await start_local_server(workdir)
+            try:
+                return await run_scenario(url, scenario)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    print(f"Running scenario '{name}' for {scenario.get('duration_seconds', 10)}s ...")
+    stats = asyncio.run(run())
+    summary = summarize(stats, float(scenario.get("duration_seconds", 10)))
+    print_report(stats, summary, args.histograms)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}")
+        return
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(summary, baseline, tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print(f"\nWithin {tolerance:.0%} of baseline {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,57 @@
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from sqlalchemy import inspect
 
-from database import Base, engine
-from routers import auth_routes, policy_summary, fraud_detection, doc_classification
+from database import Base, SessionLocal, engine, add_missing_columns, add_missing_indexes
+import document_archive
+import metrics
+import models
+import tenant_stats
+from routers import auth_routes, policy_summary, fraud_detection, doc_classification, dashboard
 
 # Create tables
+inspector = inspect(engine)
+needs_stats_backfill = not inspector.has_table(models.TenantMetric.__tablename__)
+needs_claim_dedup = inspector.has_table(models.Claim.__tablename__) and "uq_claims_tenant_claim" not in {
+    ix["name"] for ix in inspector.get_indexes(models.Claim.__tablename__)
+}
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
+document_archive.migrate_document_ids()
+if needs_claim_dedup:
+    # Claims became unique per (tenant_id, claim_id): drop retried duplicates first
+    with SessionLocal() as db:
+        fraud_detection.remove_duplicate_claims(db, adjust_stats=not needs_stats_backfill)
+        db.commit()
+add_missing_indexes()
+if needs_stats_backfill:
+    # Dashboard counters are new on this database: seed them from existing rows
+    with SessionLocal() as db:
+        tenant_stats.backfill(db)
+        db.commit()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background archival of documents past their tenant's retention
+    compaction = None
+    if document_archive.ARCHIVE_INTERVAL_SECONDS > 0:
+        compaction = asyncio.create_task(document_archive.run_compaction_loop())
+    yield
+    if compaction is not None:
+        compaction.cancel()
+
 
 app = FastAPI(
     title="Insurance SaaS Backend",
     description="Multi-tenant backend for Policy Summary, Fraud Detection, and Premium Document Classification.",
     version="0.2.0",
+    lifespan=lifespan,
 )
 
 # CORS (open for local dev – restrict in production)
@@ -26,8 +67,15 @@ app.include_router(auth_routes.router)
 app.include_router(policy_summary.router)
 app.include_router(fraud_detection.router)
 app.include_router(doc_classification.router)
+app.include_router(dashboard.router)
 
 
 @app.get("/")
 def read_root():
     return {"message": "Insurance SaaS Backend is running."}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text format (admission control, queue waits)."""
+    return metrics.render()
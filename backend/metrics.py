@@ -0,0 +1,82 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) rendered in the
+Prometheus text format at GET /metrics.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, float]] = {}
+# name -> labels -> (bucket counts, sum, count)
+_histograms: Dict[str, Dict[LabelKey, Tuple[List[int], float, int]]] = {}
+_help: Dict[str, str] = {}
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, help_text: str) -> None:
+    _help[name] = help_text
+
+
+def inc(name: str, value: float = 1.0, **labels: object) -> None:
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    with _lock:
+        _gauges.setdefault(name, {})[_key(labels)] = value
+
+
+def observe(name: str, value: float, **labels: object) -> None:
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        buckets, total, count = series.get(key) or ([0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0)
+        buckets[bisect.bisect_left(DEFAULT_BUCKETS, value)] += 1
+        series[key] = (buckets, total + value, count + 1)
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    lines: List[str] = []
+    with _lock:
+        for kind, store in (("counter", _counters), ("gauge", _gauges)):
+            for name, series in sorted(store.items()):
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for name, series in sorted(_histograms.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(DEFAULT_BUCKETS + (float("inf"),), buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+    return "\n".join(lines) + "\n"
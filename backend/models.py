@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Float, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -29,15 +31,146 @@ class User(Base):
 class Document(Base):
     """
     Stores text content of classified documents for semantic similarity
-    (here using a simple Jaccard overlap as a demo).
+    (here using a simple Jaccard overlap as a demo). Ids are AUTOINCREMENT so
+    the ids of archived rows (document_archive.py) are never handed out again.
     """
 
     __tablename__ = "documents"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), index=True)
     filename = Column(String, nullable=False)
     doc_type = Column(String, nullable=False)
     text_content = Column(Text, nullable=False)
+    # Full analysis result (DocClassAnalysisResponse JSON, without similar_docs)
+    analysis_json = Column(Text, nullable=True)
+    # NULL for rows stored before this column existed (treated as oldest)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    tenant = relationship("Tenant")
+
+
+class Claim(Base):
+    """
+    Scored claims per tenant, one row per (tenant_id, claim_id): scoring the
+    same claim again returns the stored result. The description is
+    fingerprinted with a MinHash signature split into LSH bands; each band key
+    is indexed together with the amount bucket so near-duplicate candidates
+    are found with a few index probes instead of scanning the tenant's claim
+    history.
+    """
+
+    __tablename__ = "claims"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), index=True)
+    claim_id = Column(String, nullable=False, index=True)
+    claimant_id = Column(String, nullable=True, index=True)
+    amount = Column(Float, nullable=False)
+    description = Column(Text, nullable=False)
+    is_third_party = Column(Boolean, default=False)
+    risk_level = Column(String, nullable=False)
+    score = Column(Float, nullable=False)
+    reasons_json = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Near-duplicate fingerprint (NULL when the description has no tokens)
+    amount_bucket = Column(Integer, nullable=False)
+    minhash = Column(String, nullable=True)
+    band0 = Column(Integer, nullable=True)
+    band1 = Column(Integer, nullable=True)
+    band2 = Column(Integer, nullable=True)
+    band3 = Column(Integer, nullable=True)
+    band4 = Column(Integer, nullable=True)
+    band5 = Column(Integer, nullable=True)
 
     tenant = relationship("Tenant")
+
+    __table_args__ = (
+        Index("uq_claims_tenant_claim", "tenant_id", "claim_id", unique=True),
+        Index("ix_claims_band0", "tenant_id", "band0", "amount_bucket"),
+        Index("ix_claims_band1", "tenant_id", "band1", "amount_bucket"),
+        Index("ix_claims_band2", "tenant_id", "band2", "amount_bucket"),
+        Index("ix_claims_band3", "tenant_id", "band3", "amount_bucket"),
+        Index("ix_claims_band4", "tenant_id", "band4", "amount_bucket"),
+        Index("ix_claims_band5", "tenant_id", "band5", "amount_bucket"),
+    )
+
+
+class ClaimantDailyTotal(Base):
+    """
+    Per-claimant claim count and amount for one day (`day` is a date ordinal).
+    These buckets are only read when they slide out of a rolling window.
+    """
+
+    __tablename__ = "claimant_daily_totals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    claimant_id = Column(String, nullable=False)
+    day = Column(Integer, nullable=False)
+    claim_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "claimant_id", "day", name="uq_claimant_daily_totals"),
+    )
+
+
+class ClaimantStats(Base):
+    """
+    Rolling 30/90/365-day claim counts and amount sums per claimant, maintained
+    incrementally as claims are scored. Values are current as of `as_of_day`.
+    """
+
+    __tablename__ = "claimant_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    claimant_id = Column(String, nullable=False)
+    as_of_day = Column(Integer, nullable=False)
+
+    claims_30d = Column(Integer, nullable=False, default=0)
+    claims_90d = Column(Integer, nullable=False, default=0)
+    claims_365d = Column(Integer, nullable=False, default=0)
+    amount_30d = Column(Float, nullable=False, default=0.0)
+    amount_90d = Column(Float, nullable=False, default=0.0)
+    amount_365d = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "claimant_id", name="uq_claimant_stats"),
+    )
+
+
+class TenantMetric(Base):
+    """
+    Per-tenant dashboard counters and sums (e.g. "docs_by_type:Invoice",
+    "quality_score_sum"), incremented in the same transaction as the document
+    or claim they count, so dashboard reads never aggregate over history.
+    """
+
+    __tablename__ = "tenant_metrics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    name = Column(String, nullable=False)
+    value = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_tenant_metrics"),
+    )
+
+
+class DocumentRetentionPolicy(Base):
+    """
+    Documents older than `hot_days` are moved out of the `documents` table
+    into the tenant's archive segments (see document_archive.py).
+    """
+
+    __tablename__ = "document_retention_policies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), unique=True, nullable=False)
+    hot_days = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
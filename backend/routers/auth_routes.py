@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 import schemas
 import models
 from database import get_db
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from auth import get_password_hash, verify_password, create_access_token, get_current_user, forget_cached_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -40,6 +40,8 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(user)
     db.refresh(tenant)
+    # A recreated database reuses ids: never serve a stale cached user for this one
+    forget_cached_user(user.id)
     return user
 
 
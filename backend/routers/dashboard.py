@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from auth import get_current_user
+from database import get_db
+import schemas
+import models
+import tenant_stats
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+
+@router.get("/stats", response_model=schemas.DashboardStats)
+def get_dashboard_stats(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Tenant totals for the dashboard: documents by type, documents flagged for
+    fraud review, average quality score and the claim fraud-risk distribution.
+    Read from counters maintained on every insert (see tenant_stats.py).
+    """
+    return tenant_stats.dashboard_stats(db, current_user.tenant_id)
@@ -1,20 +1,112 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from functools import cached_property
+import asyncio
+import bisect
 import io
-from typing import List, Tuple
+import json
+import os
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 import pdfplumber
 import re
 
 from auth import get_current_user
-from database import get_db
+from database import get_db, SessionLocal
+import admission
+import document_archive
+import document_export
 import schemas
 import models
+import semantic_engine
+import tenant_stats
 
 router = APIRouter(prefix="/doc-classify", tags=["Document Classification"])
 
 
+# --------- Read-only tables (built once at import, shared by forked workers) ---------
+
+DOC_TYPE_KEYWORDS = {
+    "Claim Form": [
+        "claim number",
+        "policy number",
+        "loss date",
+        "incident",
+        "insured",
+        "claim form",
+    ],
+    "Inspection Report": [
+        "inspection report",
+        "inspector",
+        "survey",
+        "site visit",
+        "observation",
+        "damage assessment",
+    ],
+    "Invoice": [
+        "invoice",
+        "gst",
+        "amount due",
+        "invoice no",
+        "bill no",
+        "subtotal",
+    ],
+    "Policy Document": [
+        "coverage",
+        "exclusions",
+        "sum insured",
+        "premium",
+        "endorsement",
+        "policy schedule",
+    ],
+    "Letter": [
+        "dear sir",
+        "dear madam",
+        "sincerely",
+        "regards",
+        "communication",
+    ],
+}
+
+INVOICE_NO_RE = re.compile(r"(invoice\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)", re.IGNORECASE)
+INVOICE_AMOUNT_RE = re.compile(
+    r"(total\s*amount|amount\s*due|grand\s*total)[:\-\s]+([\d,]+\.\d{2}|\d+)", re.IGNORECASE
+)
+INVOICE_DATE_RE = re.compile(
+    r"(invoice\s*date|date)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})", re.IGNORECASE
+)
+CLAIM_NO_RE = re.compile(r"(claim\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)", re.IGNORECASE)
+POLICY_NO_RE = re.compile(r"(policy\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)", re.IGNORECASE)
+LOSS_DATE_RE = re.compile(
+    r"(date\s*of\s*loss|loss\s*date)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
+    re.IGNORECASE,
+)
+INSPECTOR_NAME_RE = re.compile(r"(inspector\s*name)[:\-\s]+([A-Za-z\s\.]+)", re.IGNORECASE)
+INSPECTION_DATE_RE = re.compile(
+    r"(inspection\s*date|date\s*of\s*inspection)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
+    re.IGNORECASE,
+)
+SUM_INSURED_RE = re.compile(r"(sum\s*insured)[:\-\s]+([A-Za-z0-9,\. ]+)", re.IGNORECASE)
+COVERAGE_LIMIT_RE = re.compile(
+    r"(coverage\s*limit|limit\s*of\s*liability)[:\-\s]+([A-Za-z0-9,\. ]+)", re.IGNORECASE
+)
+
+SUSPICIOUS_DOC_WORDS = ("urgent", "immediately", "lost", "duplicate", "backdated")
+
+IMPORTANT_FIELD_NAMES = {
+    "Invoice": ["Invoice Number", "Amount"],
+    "Claim Form": ["Claim Number", "Policy Number"],
+}
+
+
 # --------- Helpers ---------
 
+# (start, end, label) character offsets into the analyzed text
+TextSpan = Tuple[int, int, str]
+
 
 def extract_text_from_pdf_with_pages(file_bytes: bytes) -> List[str]:
     """Returns list of per-page text strings."""
@@ -26,58 +118,24 @@ def extract_text_from_pdf_with_pages(file_bytes: bytes) -> List[str]:
     return texts
 
 
+def find_all(haystack: str, needle: str, start: int = 0) -> Iterator[int]:
+    """Start offsets of every non-overlapping occurrence of `needle` from `start` on."""
+    start = haystack.find(needle, start)
+    while start != -1:
+        yield start
+        start = haystack.find(needle, start + len(needle))
+
+
 def simple_doc_type_keywords(text_lower: str) -> Tuple[str, List[str], float]:
     """
     Basic keyword engine that returns (doc_type, matched_keywords, score).
     Score in [0,1].
     """
-    patterns = {
-        "Claim Form": [
-            "claim number",
-            "policy number",
-            "loss date",
-            "incident",
-            "insured",
-            "claim form",
-        ],
-        "Inspection Report": [
-            "inspection report",
-            "inspector",
-            "survey",
-            "site visit",
-            "observation",
-            "damage assessment",
-        ],
-        "Invoice": [
-            "invoice",
-            "gst",
-            "amount due",
-            "invoice no",
-            "bill no",
-            "subtotal",
-        ],
-        "Policy Document": [
-            "coverage",
-            "exclusions",
-            "sum insured",
-            "premium",
-            "endorsement",
-            "policy schedule",
-        ],
-        "Letter": [
-            "dear sir",
-            "dear madam",
-            "sincerely",
-            "regards",
-            "communication",
-        ],
-    }
-
     best_type = "Other"
     best_hits: List[str] = []
     best_score = 0.0
 
-    for doc_type, keywords in patterns.items():
+    for doc_type, keywords in DOC_TYPE_KEYWORDS.items():
         hits = [kw for kw in keywords if kw in text_lower]
         if hits:
             # simple scoring: hits / total_keywords
@@ -90,7 +148,7 @@ def simple_doc_type_keywords(text_lower: str) -> Tuple[str, List[str], float]:
     return best_type, best_hits, best_score
 
 
-def layout_heuristic(text: str, num_pages: int) -> float:
+def layout_heuristic(text: str, num_pages: int, text_lower: Optional[str] = None) -> float:
     """
     Very rough approximation of layout confidence:
     - Long, table-like content => invoice/policy
@@ -101,9 +159,11 @@ def layout_heuristic(text: str, num_pages: int) -> float:
         return 0.2
 
     avg_line_len = sum(len(l) for l in lines) / max(len(lines), 1)
+    if text_lower is None:
+        text_lower = text.lower()
 
     score = 0.3
-    if "invoice" in text.lower() or "bill" in text.lower():
+    if "invoice" in text_lower or "bill" in text_lower:
         score += 0.3
     if avg_line_len > 60:
         score += 0.2
@@ -115,8 +175,8 @@ def layout_heuristic(text: str, num_pages: int) -> float:
 
 def semantic_placeholder_score(doc_type: str) -> float:
     """
-    Placeholder for a semantic model (e.g. DistilBERT).
-    Right now, we assign high confidence if doc_type != Other.
+    Fallback used until a semantic model has been trained
+    (see semantic_engine.py): high confidence if doc_type != Other.
     """
     if doc_type == "Other":
         return 0.4
@@ -124,6 +184,7 @@ def semantic_placeholder_score(doc_type: str) -> float:
 
 
 def extract_fields(doc_type: str, text: str) -> List[schemas.ExtractionField]:
+    """Regex field extraction per doc type."""
     fields: List[schemas.ExtractionField] = []
 
     def add_field(name: str, value: str | None, conf: float):
@@ -135,99 +196,27 @@ def extract_fields(doc_type: str, text: str) -> List[schemas.ExtractionField]:
             )
         )
 
-    if doc_type == "Invoice":
-        invoice_no = re.search(
-            r"(invoice\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)",
-            text,
-            re.IGNORECASE,
-        )
-        amount = re.search(
-            r"(total\s*amount|amount\s*due|grand\s*total)[:\-\s]+([\d,]+\.\d{2}|\d+)",
-            text,
-            re.IGNORECASE,
-        )
-        date = re.search(
-            r"(invoice\s*date|date)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
-            text,
-            re.IGNORECASE,
-        )
+    def add_match(name: str, match: Optional[re.Match], group: int, conf: float):
+        value = match.group(group) if match else None
+        add_field(name, value, conf if match else 0.4)
 
-        add_field(
-            "Invoice Number", invoice_no.group(3) if invoice_no else None, 0.9 if invoice_no else 0.4
-        )
-        add_field("Amount", amount.group(2) if amount else None, 0.9 if amount else 0.4)
-        add_field(
-            "Invoice Date", date.group(2) if date else None, 0.8 if date else 0.4
-        )
+    if doc_type == "Invoice":
+        add_match("Invoice Number", INVOICE_NO_RE.search(text), 3, 0.9)
+        add_match("Amount", INVOICE_AMOUNT_RE.search(text), 2, 0.9)
+        add_match("Invoice Date", INVOICE_DATE_RE.search(text), 2, 0.8)
 
     elif doc_type == "Claim Form":
-        claim_no = re.search(
-            r"(claim\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)",
-            text,
-            re.IGNORECASE,
-        )
-        policy_no = re.search(
-            r"(policy\s*(no\.?|number)[:\-\s]+)([A-Za-z0-9\-\/]+)",
-            text,
-            re.IGNORECASE,
-        )
-        loss_date = re.search(
-            r"(date\s*of\s*loss|loss\s*date)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
-            text,
-            re.IGNORECASE,
-        )
-
-        add_field(
-            "Claim Number", claim_no.group(3) if claim_no else None, 0.9 if claim_no else 0.4
-        )
-        add_field(
-            "Policy Number", policy_no.group(3) if policy_no else None, 0.9 if policy_no else 0.4
-        )
-        add_field(
-            "Loss Date", loss_date.group(2) if loss_date else None, 0.8 if loss_date else 0.4
-        )
+        add_match("Claim Number", CLAIM_NO_RE.search(text), 3, 0.9)
+        add_match("Policy Number", POLICY_NO_RE.search(text), 3, 0.9)
+        add_match("Loss Date", LOSS_DATE_RE.search(text), 2, 0.8)
 
     elif doc_type == "Inspection Report":
-        inspector = re.search(
-            r"(inspector\s*name)[:\-\s]+([A-Za-z\s\.]+)", text, re.IGNORECASE
-        )
-        date = re.search(
-            r"(inspection\s*date|date\s*of\s*inspection)[:\-\s]+([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})",
-            text,
-            re.IGNORECASE,
-        )
-
-        add_field(
-            "Inspector Name",
-            inspector.group(2) if inspector else None,
-            0.8 if inspector else 0.4,
-        )
-        add_field(
-            "Inspection Date",
-            date.group(2) if date else None,
-            0.8 if date else 0.4,
-        )
+        add_match("Inspector Name", INSPECTOR_NAME_RE.search(text), 2, 0.8)
+        add_match("Inspection Date", INSPECTION_DATE_RE.search(text), 2, 0.8)
 
     elif doc_type == "Policy Document":
-        sum_insured = re.search(
-            r"(sum\s*insured)[:\-\s]+([A-Za-z0-9,\. ]+)", text, re.IGNORECASE
-        )
-        coverage_limit = re.search(
-            r"(coverage\s*limit|limit\s*of\s*liability)[:\-\s]+([A-Za-z0-9,\. ]+)",
-            text,
-            re.IGNORECASE,
-        )
-
-        add_field(
-            "Sum Insured",
-            sum_insured.group(2) if sum_insured else None,
-            0.7 if sum_insured else 0.4,
-        )
-        add_field(
-            "Coverage Limit",
-            coverage_limit.group(2) if coverage_limit else None,
-            0.7 if coverage_limit else 0.4,
-        )
+        add_match("Sum Insured", SUM_INSURED_RE.search(text), 2, 0.7)
+        add_match("Coverage Limit", COVERAGE_LIMIT_RE.search(text), 2, 0.7)
 
     if not fields:
         add_field("Note", "No specific structured fields extracted.", 0.3)
@@ -243,8 +232,7 @@ def fraud_signals_heuristic(
     signals: List[schemas.FraudSignal] = []
     lower = text.lower()
 
-    suspicious_words = ["urgent", "immediately", "lost", "duplicate", "backdated"]
-    hits = [w for w in suspicious_words if w in lower]
+    hits = [w for w in SUSPICIOUS_DOC_WORDS if w in lower]
     if hits:
         signals.append(
             schemas.FraudSignal(
@@ -254,13 +242,8 @@ def fraud_signals_heuristic(
             )
         )
 
-    important_field_names = {
-        "Invoice": ["Invoice Number", "Amount"],
-        "Claim Form": ["Claim Number", "Policy Number"],
-    }
-
-    if doc_type in important_field_names:
-        for required in important_field_names[doc_type]:
+    if doc_type in IMPORTANT_FIELD_NAMES:
+        for required in IMPORTANT_FIELD_NAMES[doc_type]:
             if not any(f.name == required and f.value for f in fields):
                 signals.append(
                     schemas.FraudSignal(
@@ -314,9 +297,11 @@ def generate_tags(
     return list(sorted(set(tags)))
 
 
-def jaccard_similarity(a: str, b: str) -> float:
-    a_tokens = set(a.lower().split())
-    b_tokens = set(b.lower().split())
+# (id, filename, doc_type, token set) of a tenant's stored documents
+SimilarityCorpus = List[Tuple[int, str, str, Set[str]]]
+
+
+def jaccard_tokens(a_tokens: Set[str], b_tokens: Set[str]) -> float:
     if not a_tokens or not b_tokens:
         return 0.0
     intersection = len(a_tokens & b_tokens)
@@ -324,18 +309,38 @@ def jaccard_similarity(a: str, b: str) -> float:
     return intersection / union
 
 
-def find_similar_docs(
-    db: Session,
-    tenant_id: int,
+def load_similarity_corpus(
+    db: Session, tenant_id: int, include_archived: bool = False
+) -> SimilarityCorpus:
+    rows = (
+        db.query(
+            models.Document.id,
+            models.Document.filename,
+            models.Document.doc_type,
+            models.Document.text_content,
+        )
+        .filter(models.Document.tenant_id == tenant_id)
+        .all()
+    )
+    corpus = [(r.id, r.filename, r.doc_type, set(r.text_content.lower().split())) for r in rows]
+    if include_archived:
+        corpus.extend(
+            (d["id"], d["filename"], d["doc_type"], set(d["text_content"].lower().split()))
+            for d in document_archive.iter_archived_documents(tenant_id)
+        )
+    return corpus
+
+
+def rank_similar_docs(
+    corpus: SimilarityCorpus,
     current_text: str,
-    current_type: str,
     limit: int = 3,
 ) -> List[schemas.SimilarDoc]:
-    docs = db.query(models.Document).filter(models.Document.tenant_id == tenant_id).all()
+    current_tokens = set(current_text.lower().split())
 
-    sims: List[tuple[models.Document, float]] = []
-    for d in docs:
-        sim = jaccard_similarity(current_text, d.text_content)
+    sims: List[tuple[tuple, float]] = []
+    for d in corpus:
+        sim = jaccard_tokens(current_tokens, d[3])
         if sim > 0:
             sims.append((d, sim))
 
@@ -344,16 +349,32 @@ def find_similar_docs(
 
     return [
         schemas.SimilarDoc(
-            id=d.id,
-            filename=d.filename,
-            doc_type=d.doc_type,
+            id=doc_id,
+            filename=filename,
+            doc_type=doc_type,
             similarity=sim,
         )
-        for d, sim in top
+        for (doc_id, filename, doc_type, _), sim in top
     ]
 
 
-def per_page_map(page_texts: List[str]) -> List[schemas.PageType]:
+def find_similar_docs(
+    db: Session,
+    tenant_id: int,
+    current_text: str,
+    current_type: str,
+    limit: int = 3,
+    include_archived: bool = False,
+) -> List[schemas.SimilarDoc]:
+    return rank_similar_docs(
+        load_similarity_corpus(db, tenant_id, include_archived), current_text, limit
+    )
+
+
+def per_page_map(
+    page_texts: List[str],
+    semantic_preds: Optional[List[Tuple[str, float]]] = None,
+) -> List[schemas.PageType]:
     page_map: List[schemas.PageType] = []
     for idx, page_text in enumerate(page_texts):
         doc_type, hits, score = simple_doc_type_keywords(page_text.lower())
@@ -361,18 +382,346 @@ def per_page_map(page_texts: List[str]) -> List[schemas.PageType]:
             conf = 0.4
         else:
             conf = 0.6 + score * 0.4
+        if semantic_preds:
+            sem_type, sem_prob = semantic_preds[idx]
+            if sem_type != doc_type and sem_prob >= semantic_engine.OVERRIDE_CONFIDENCE:
+                doc_type, conf = sem_type, sem_prob
         page_map.append(
             schemas.PageType(page_number=idx + 1, doc_type=doc_type, confidence=conf)
         )
     return page_map
 
 
+# --------- Lazy analysis ---------
+
+# Output sections of DocClassAnalysisResponse that can be requested via `fields=`
+ANALYSIS_SECTIONS = (
+    "doc_type",
+    "confidence",
+    "keywords_matched",
+    "engine_breakdown",
+    "extracted_fields",
+    "fraud_signals",
+    "tags",
+    "quality_score",
+    "similar_docs",
+    "page_map",
+    "highlight_phrases",
+    "highlight_spans",
+)
+
+
+def parse_sections(fields: Optional[str]) -> List[str]:
+    """Comma-separated `fields=` value -> requested sections (all when omitted)."""
+    if fields is None:
+        return list(ANALYSIS_SECTIONS)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in ANALYSIS_SECTIONS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}. "
+            f"Allowed: {', '.join(ANALYSIS_SECTIONS)}",
+        )
+    return list(dict.fromkeys(requested))
+
+
+# Sections persisted with a stored document. similar_docs is relative to the
+# corpus at analysis time and the highlights are derived from other sections.
+STORED_SECTIONS = tuple(
+    s
+    for s in ANALYSIS_SECTIONS
+    if s not in ("similar_docs", "highlight_phrases", "highlight_spans")
+)
+
+# PDF pages are joined with this into the full text
+PAGE_SEPARATOR = "\n\n"
+
+
+def parse_page_window(pages: Optional[str]) -> Optional[Tuple[int, int]]:
+    """`highlight_pages=` value ('3' or '2-5', 1-based, inclusive) -> (first, last)."""
+    if pages is None:
+        return None
+    try:
+        first, _, last = pages.partition("-")
+        window = (int(first), int(last or first))
+    except ValueError:
+        window = (0, 0)
+    if window[0] < 1 or window[1] < window[0]:
+        raise HTTPException(
+            status_code=400,
+            detail="highlight_pages must be a page number or range like '2-5'.",
+        )
+    return window
+
+
+def extract_document_text(
+    content: bytes, filename: str, content_type: Optional[str]
+) -> Tuple[List[str], str, bool]:
+    """Returns (page_texts, full_text, is_pdf) or raises HTTPException(400)."""
+    if not content:
+        raise HTTPException(status_code=400, detail="Empty file.")
+
+    is_pdf = content_type == "application/pdf" or filename.lower().endswith(".pdf")
+
+    if is_pdf:
+        page_texts = extract_text_from_pdf_with_pages(content)
+        full_text = PAGE_SEPARATOR.join(page_texts)
+    else:
+        try:
+            full_text = content.decode("utf-8", errors="ignore")
+            page_texts = [full_text]
+        except Exception:
+            raise HTTPException(status_code=400, detail="Unsupported file encoding.")
+
+    if not full_text.strip():
+        raise HTTPException(status_code=400, detail="No text found in document.")
+
+    return page_texts, full_text, is_pdf
+
+
+class DocumentAnalysis:
+    """
+    Analysis of one document where every stage is a cached property: a stage
+    runs only when its output, or the output of a stage depending on it, is read.
+    Property names match the DocClassAnalysisResponse sections.
+    """
+
+    def __init__(
+        self,
+        page_texts: List[str],
+        full_text: str,
+        is_pdf: bool,
+        db: Optional[Session],
+        tenant_id: int,
+        similarity_corpus: Optional[SimilarityCorpus] = None,
+        highlight_pages: Optional[Tuple[int, int]] = None,
+        include_archived: bool = False,
+    ):
+        self.page_texts = page_texts
+        self.full_text = full_text
+        self.is_pdf = is_pdf
+        self.db = db
+        self.tenant_id = tenant_id
+        # Pre-loaded corpus (batch analysis) instead of one query per document
+        self.similarity_corpus = similarity_corpus
+        # Only return highlight spans within this page window (1-based, inclusive)
+        self.highlight_pages = highlight_pages
+        # Also search the tenant's archived documents for similar_docs
+        self.include_archived = include_archived
+
+    def build_response(self, sections: List[str]) -> schemas.DocClassAnalysisResponse:
+        return schemas.DocClassAnalysisResponse(
+            **{name: getattr(self, name) for name in sections}
+        )
+
+    @cached_property
+    def _text_lower(self) -> str:
+        return self.full_text.lower()
+
+    # 1) Keyword engine
+    @cached_property
+    def _keyword_result(self) -> Tuple[str, List[str], float]:
+        return simple_doc_type_keywords(self._text_lower)
+
+    # 2) Layout engine
+    @cached_property
+    def _layout_score(self) -> float:
+        return layout_heuristic(self.full_text, len(self.page_texts), self._text_lower)
+
+    # 3) Semantic engine (whole document)
+    @cached_property
+    def _semantic_result(self) -> Tuple[str, float]:
+        kw_doc_type = self._keyword_result[0]
+        final_type = kw_doc_type
+        model = semantic_engine.get_model()
+        if model is None:
+            return final_type, semantic_placeholder_score(kw_doc_type)
+
+        probs = model.predict_proba([self.full_text])
+        sem_type = model.labels[int(probs[0].argmax())]
+        sem_prob = float(probs[0].max())
+        # Confident semantic prediction overrides the keyword engine
+        if sem_type != kw_doc_type and sem_prob >= semantic_engine.OVERRIDE_CONFIDENCE:
+            final_type = sem_type
+        if final_type in model.labels:
+            sem_score = model.probability_of(probs[0], final_type)
+        else:
+            # e.g. "Other" when no such documents were in the training data
+            sem_score = 1.0 - sem_prob
+        return final_type, sem_score
+
+    # Semantic engine per page (multi-page documents), only needed by page_map
+    @cached_property
+    def _page_predictions(self) -> Optional[List[Tuple[str, float]]]:
+        model = semantic_engine.get_model()
+        if model is None or len(self.page_texts) < 2:
+            return None
+        return model.predict(self.page_texts)
+
+    @cached_property
+    def doc_type(self) -> str:
+        return self._semantic_result[0]
+
+    @cached_property
+    def confidence(self) -> float:
+        # Combine into final confidence
+        return min(
+            1.0,
+            0.4 * self._semantic_result[1]
+            + 0.35 * self._keyword_result[2]
+            + 0.25 * self._layout_score,
+        )
+
+    @cached_property
+    def keywords_matched(self) -> List[str]:
+        return self._keyword_result[1]
+
+    @cached_property
+    def engine_breakdown(self) -> Dict[str, float]:
+        return {
+            "keyword_engine": round(float(self._keyword_result[2]), 3),
+            "semantic_engine": round(float(self._semantic_result[1]), 3),
+            "layout_engine": round(float(self._layout_score), 3),
+            "final_confidence": round(float(self.confidence), 3),
+        }
+
+    @cached_property
+    def extracted_fields(self) -> List[schemas.ExtractionField]:
+        return extract_fields(self.doc_type, self.full_text)
+
+    @cached_property
+    def fraud_signals(self) -> List[schemas.FraudSignal]:
+        return fraud_signals_heuristic(self.doc_type, self.full_text, self.extracted_fields)
+
+    @cached_property
+    def tags(self) -> List[str]:
+        return generate_tags(self.doc_type, self.extracted_fields, self.fraud_signals)
+
+    @cached_property
+    def quality_score(self) -> float:
+        return quality_score_heuristic(self.full_text, self.is_pdf)
+
+    @cached_property
+    def page_map(self) -> List[schemas.PageType]:
+        return per_page_map(self.page_texts, self._page_predictions)
+
+    @cached_property
+    def similar_docs(self) -> List[schemas.SimilarDoc]:
+        if self.similarity_corpus is not None:
+            return rank_similar_docs(self.similarity_corpus, self.full_text)
+        return find_similar_docs(
+            db=self.db,
+            tenant_id=self.tenant_id,
+            current_text=self.full_text,
+            current_type=self.doc_type,
+            include_archived=self.include_archived,
+        )
+
+    @cached_property
+    def highlight_phrases(self) -> List[str]:
+        # For frontend text highlighting
+        phrases: List[str] = list(self.keywords_matched)
+        for f in self.extracted_fields:
+            if f.value and f.name != "Note":
+                phrases.append(f.value)
+        return list(dict.fromkeys(phrases))  # unique
+
+    @cached_property
+    def _match_spans(self) -> List[TextSpan]:
+        """
+        Every (case-insensitive) occurrence of the winning type's matched
+        keywords and of the extracted field values. Only highlight_spans reads
+        this, so other sections never pay for the extra scans.
+        """
+        text_lower = self._text_lower
+        if len(text_lower) != len(self.full_text):
+            return []  # lower() changed the length, offsets would not line up
+        needles = [(kw, "keyword") for kw in self.keywords_matched]
+        needles += [
+            (f.value.lower(), f.name) for f in self.extracted_fields if f.value and f.name != "Note"
+        ]
+        return [
+            (start, start + len(needle), label)
+            for needle, label in needles
+            for start in find_all(text_lower, needle)
+        ]
+
+    @cached_property
+    def highlight_spans(self) -> List[schemas.HighlightSpan]:
+        """Page-relative offsets of the keyword and field value matches."""
+        page_starts: List[int] = []
+        offset = 0
+        for page_text in self.page_texts:
+            page_starts.append(offset)
+            offset += len(page_text) + len(PAGE_SEPARATOR)
+
+        first, last = self.highlight_pages or (1, len(self.page_texts))
+        spans: List[schemas.HighlightSpan] = []
+        for start, end, label in sorted(self._match_spans):
+            page_idx = bisect.bisect_right(page_starts, start) - 1
+            if not first <= page_idx + 1 <= last:
+                continue
+            page_start = page_starts[page_idx]
+            page_end = page_start + len(self.page_texts[page_idx])
+            spans.append(
+                schemas.HighlightSpan(
+                    page=page_idx + 1,
+                    start=start - page_start,
+                    end=min(end, page_end) - page_start,
+                    label=label,
+                )
+            )
+        return spans
+
+    def to_document(self, filename: str) -> models.Document:
+        # Storing computes every stored section, even if the response omits it
+        analysis = self.build_response(list(STORED_SECTIONS))
+        return models.Document(
+            tenant_id=self.tenant_id,
+            filename=filename,
+            doc_type=self.doc_type,
+            text_content=self.full_text[:5000],  # limit size
+            analysis_json=analysis.json(exclude_unset=True),
+        )
+
+    def metric_increments(self) -> Counter:
+        """This document's contribution to the tenant's dashboard counters."""
+        return tenant_stats.document_increments(
+            self.doc_type, self.quality_score, fraud_review=bool(self.fraud_signals)
+        )
+
+
 # --------- Endpoint ---------
 
 
-@router.post("/analyze", response_model=schemas.DocClassAnalysisResponse)
+@router.post(
+    "/analyze",
+    response_model=schemas.DocClassAnalysisResponse,
+    response_model_exclude_unset=True,
+    dependencies=[Depends(admission.limit("analyze"))],
+)
 async def analyze_document(
     file: UploadFile = File(...),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated response sections to compute, e.g. "
+        "'doc_type,confidence'. All sections when omitted.",
+    ),
+    store: Optional[bool] = Query(
+        None,
+        description="Store the document for similarity search. "
+        "Defaults to true for a full analysis and false when `fields` is given.",
+    ),
+    highlight_pages: Optional[str] = Query(
+        None,
+        description="Only return highlight_spans on these pages, e.g. '3' or '2-5' (1-based).",
+    ),
+    include_archived: bool = Query(
+        False,
+        description="Also search archived documents for similar_docs (slower).",
+    ),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -387,103 +736,334 @@ async def analyze_document(
     - quality score
     - page-level doc_type map
     - similar docs (same tenant)
+    - highlight phrases and page-relative highlight spans
+
+    With `fields=`, only the requested sections (and the stages they depend on)
+    are computed and the others are omitted from the response.
     """
+    sections = parse_sections(fields)
+    page_window = parse_page_window(highlight_pages)
+    if store is None:
+        store = fields is None
+
     content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file.")
 
-    is_pdf = file.content_type == "application/pdf" or file.filename.lower().endswith(
-        ".pdf"
-    )
+    def analyze() -> schemas.DocClassAnalysisResponse:
+        page_texts, full_text, is_pdf = extract_document_text(
+            content, file.filename, file.content_type
+        )
 
-    if is_pdf:
-        page_texts = extract_text_from_pdf_with_pages(content)
-        full_text = "\n\n".join(page_texts)
-    else:
-        try:
-            full_text = content.decode("utf-8", errors="ignore")
-            page_texts = [full_text]
-        except Exception:
-            raise HTTPException(status_code=400, detail="Unsupported file encoding.")
+        analysis = DocumentAnalysis(
+            page_texts=page_texts,
+            full_text=full_text,
+            is_pdf=is_pdf,
+            db=db,
+            tenant_id=current_user.tenant_id,
+            highlight_pages=page_window,
+            include_archived=include_archived,
+        )
+        response = analysis.build_response(sections)
 
-    if not full_text.strip():
-        raise HTTPException(status_code=400, detail="No text found in document.")
+        # Store current doc (after similarity search so it does not match itself)
+        if store:
+            db.add(analysis.to_document(file.filename))
+            tenant_stats.increment(db, current_user.tenant_id, analysis.metric_increments())
+            db.commit()
 
-    text_lower = full_text.lower()
+        return response
 
-    # 1) Keyword engine
-    kw_doc_type, matched_keywords, kw_score = simple_doc_type_keywords(text_lower)
+    # Extraction and analysis are CPU bound: off the event loop, so one
+    # tenant's documents cannot stall other requests past their admission caps
+    return await asyncio.get_running_loop().run_in_executor(None, analyze)
 
-    # 2) Layout engine
-    layout_score = layout_heuristic(full_text, num_pages=len(page_texts))
 
-    # 3) Semantic (placeholder)
-    sem_score = semantic_placeholder_score(kw_doc_type)
+# --------- Batch analysis ---------
 
-    # Final doc type
-    final_type = kw_doc_type if kw_doc_type != "Other" else "Other"
+BATCH_MAX_ENTRIES = 500
+BATCH_MAX_ENTRY_BYTES = 25 * 1024 * 1024
+BATCH_WORKERS = min(8, os.cpu_count() or 1)
+# Entries one tenant may have running on the shared pool, across all its packets
+BATCH_TENANT_WORKERS = max(1, BATCH_WORKERS // 2)
 
-    # Combine into final confidence
-    final_confidence = min(
-        1.0,
-        0.4 * sem_score + 0.35 * kw_score + 0.25 * layout_score,
-    )
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="doc-batch")
+_tenant_batch_slots: Dict[int, asyncio.Semaphore] = {}
 
-    # Extract fields
-    fields = extract_fields(final_type, full_text)
+# (filename, reader returning the entry bytes, content type)
+BatchEntry = Tuple[str, Callable[[], bytes], Optional[str]]
 
-    # Fraud signals
-    fraud_signals = fraud_signals_heuristic(final_type, full_text, fields)
 
-    # Quality score
-    quality_score = quality_score_heuristic(full_text, is_pdf)
+def is_zip_upload(upload: UploadFile) -> bool:
+    return upload.content_type in ("application/zip", "application/x-zip-compressed") or (
+        upload.filename or ""
+    ).lower().endswith(".zip")
 
-    # Tags
-    tags = generate_tags(final_type, fields, fraud_signals)
 
-    # Page map
-    page_map = per_page_map(page_texts)
+def _zip_entry_reader(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Callable[[], bytes]:
+    def read() -> bytes:
+        if info.file_size > BATCH_MAX_ENTRY_BYTES:
+            raise HTTPException(status_code=413, detail="File too large.")
+        return archive.read(info)
 
-    # Similar docs
-    similar_docs = find_similar_docs(
-        db=db,
-        tenant_id=current_user.tenant_id,
-        current_text=full_text,
-        current_type=final_type,
-    )
+    return read
 
-    # Store current doc
-    new_doc = models.Document(
-        tenant_id=current_user.tenant_id,
-        filename=file.filename,
-        doc_type=final_type,
-        text_content=full_text[:5000],  # limit size
-    )
-    db.add(new_doc)
-    db.commit()
 
-    engine_breakdown = {
-        "keyword_engine": round(float(kw_score), 3),
-        "semantic_engine": round(float(sem_score), 3),
-        "layout_engine": round(float(layout_score), 3),
-        "final_confidence": round(float(final_confidence), 3),
-    }
-
-    highlight_phrases: List[str] = list(matched_keywords)
-    for f in fields:
-        if f.value and f.name != "Note":
-            highlight_phrases.append(f.value)
-
-    return schemas.DocClassAnalysisResponse(
-        doc_type=final_type,
-        confidence=float(final_confidence),
-        keywords_matched=matched_keywords,
-        engine_breakdown=engine_breakdown,
-        extracted_fields=fields,
-        fraud_signals=fraud_signals,
-        tags=tags,
-        quality_score=quality_score,
-        similar_docs=similar_docs,
-        page_map=page_map,
-        highlight_phrases=list(dict.fromkeys(highlight_phrases)),  # unique
+def iter_batch_entries(uploads: List[UploadFile]) -> Iterator[BatchEntry]:
+    """
+    Yields one entry per uploaded file, expanding zip archives. Entries are only
+    read when their reader is called, so an archive is never extracted into
+    memory as a whole.
+    """
+    for upload in uploads:
+        if not is_zip_upload(upload):
+            yield upload.filename, upload.file.read, upload.content_type
+            continue
+
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {upload.filename}")
+
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            yield name, _zip_entry_reader(archive, info), None
+
+
+def _tenant_batch_slot(tenant_id: int) -> asyncio.Semaphore:
+    slots = _tenant_batch_slots.get(tenant_id)
+    if slots is None:
+        slots = _tenant_batch_slots[tenant_id] = asyncio.Semaphore(BATCH_TENANT_WORKERS)
+    return slots
+
+
+def _analyze_batch_entry(
+    entry: BatchEntry,
+    sections: List[str],
+    tenant_id: int,
+    corpus: Optional[SimilarityCorpus],
+    page_window: Optional[Tuple[int, int]] = None,
+    store: bool = False,
+) -> Tuple[dict, Optional[models.Document], Counter]:
+    """
+    Returns (NDJSON line, Document to insert, dashboard counter increments).
+    The Document and increments are only built when storing: to_document()
+    computes every stored section, which would defeat `fields=`.
+    """
+    filename, read, content_type = entry
+    try:
+        page_texts, full_text, is_pdf = extract_document_text(read(), filename, content_type)
+        analysis = DocumentAnalysis(
+            page_texts=page_texts,
+            full_text=full_text,
+            is_pdf=is_pdf,
+            db=None,
+            tenant_id=tenant_id,
+            similarity_corpus=corpus,
+            highlight_pages=page_window,
+        )
+        response = analysis.build_response(sections)
+    except HTTPException as exc:
+        return {"filename": filename, "error": exc.detail}, None, Counter()
+    except Exception:
+        return {"filename": filename, "error": "Could not analyze file."}, None, Counter()
+
+    line = {"filename": filename, "result": response.dict(exclude_unset=True)}
+    if not store:
+        return line, None, Counter()
+    return line, analysis.to_document(filename), analysis.metric_increments()
+
+
+@router.post(
+    "/analyze-batch",
+    dependencies=[Depends(admission.limit("analyze", charge_per_request=False))],
+)
+async def analyze_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated response sections to compute per document. "
+        "All sections when omitted.",
+    ),
+    store: Optional[bool] = Query(
+        None,
+        description="Store the documents for similarity search. "
+        "Defaults to true for a full analysis and false when `fields` is given.",
+    ),
+    highlight_pages: Optional[str] = Query(
+        None,
+        description="Only return highlight_spans on these pages, e.g. '3' or '2-5' (1-based).",
+    ),
+    include_archived: bool = Query(
+        False,
+        description="Also search archived documents for similar_docs (slower).",
+    ),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Analyze a claim packet: a zip archive and/or several files in one multipart
+    upload. Entries are analyzed concurrently on a worker pool and streamed back
+    as NDJSON in completion order, one line per file:
+
+        {"filename": "...", "result": {...DocClassAnalysisResponse...}}
+        {"filename": "...", "error": "..."}
+
+    followed by a final {"summary": {...}} line. Every entry is charged to the
+    tenant's "analyze" budget like a single upload, and a tenant's packets
+    share at most BATCH_TENANT_WORKERS of the pool. Similar documents are searched
+    against one snapshot of the tenant's documents loaded per packet, and the
+    packet's documents are inserted, and the tenant's dashboard counters
+    updated, in a single transaction at the end.
+    """
+    sections = parse_sections(fields)
+    page_window = parse_page_window(highlight_pages)
+    if store is None:
+        store = fields is None
+
+    # Validate archives and the entry count before the response starts streaming
+    entries = list(iter_batch_entries(files))
+    if not entries:
+        raise HTTPException(status_code=400, detail="No files found in upload.")
+    if len(entries) > BATCH_MAX_ENTRIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files in packet (max {BATCH_MAX_ENTRIES}).",
+        )
+
+    tenant_id = current_user.tenant_id
+    admission.charge_or_reject(request, tenant_id, "analyze", len(entries))
+    tenant_slots = _tenant_batch_slot(tenant_id)
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        db = SessionLocal()
+        try:
+            corpus: Optional[SimilarityCorpus] = None
+            if "similar_docs" in sections:
+                corpus = await loop.run_in_executor(
+                    _batch_executor, load_similarity_corpus, db, tenant_id, include_archived
+                )
+
+            remaining = iter(entries)
+            pending = set()
+            documents: List[models.Document] = []
+            increments: Counter = Counter()
+            analyzed = 0
+            failed = 0
+
+            async def analyze_entry(entry: BatchEntry):
+                async with tenant_slots:
+                    return await loop.run_in_executor(
+                        _batch_executor,
+                        _analyze_batch_entry,
+                        entry,
+                        sections,
+                        tenant_id,
+                        corpus,
+                        page_window,
+                        store,
+                    )
+
+            while True:
+                # Keep at most BATCH_TENANT_WORKERS entries read into memory at once
+                for entry in remaining:
+                    pending.add(asyncio.ensure_future(analyze_entry(entry)))
+                    if len(pending) >= BATCH_TENANT_WORKERS:
+                        break
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    line, document, document_increments = future.result()
+                    if "error" in line:
+                        failed += 1
+                    else:
+                        analyzed += 1
+                    if document is not None:
+                        documents.append(document)
+                        increments.update(document_increments)
+                    yield json.dumps(line) + "\n"
+
+            if store and documents:
+
+                def commit_packet():
+                    db.add_all(documents)
+                    tenant_stats.increment(db, tenant_id, increments)
+                    db.commit()
+
+                await loop.run_in_executor(_batch_executor, commit_packet)
+
+            summary = {
+                "files": len(entries),
+                "analyzed": analyzed,
+                "failed": failed,
+                "stored": len(documents),
+            }
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# --------- Export ---------
+
+
+@router.get("/export")
+def export_documents(
+    fmt: str = Query("ndjson", alias="format", description="'ndjson' or 'csv'"),
+    gzip: bool = Query(False, description="Gzip-compress the export"),
+    include_archived: bool = Query(False, description="Include archived documents"),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Streams all stored documents of the current tenant as NDJSON or CSV. Rows
+    are read in fixed-size chunks, so memory use does not depend on the
+    tenant's size and concurrent inserts are not blocked.
+    """
+    if fmt not in document_export.EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format '{fmt}'. Allowed: {', '.join(document_export.EXPORT_FORMATS)}",
+        )
+
+    tenant_id = current_user.tenant_id
+    filename = document_export.export_filename(tenant_id, fmt, gzip)
+    return StreamingResponse(
+        document_export.export_documents(tenant_id, fmt, gzip, include_archived=include_archived),
+        media_type="application/gzip" if gzip else document_export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
+
+
+# --------- Retention ---------
+
+
+@router.get("/retention", response_model=schemas.RetentionPolicy)
+def get_retention(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """The tenant's document retention (hot_days null: nothing is archived)."""
+    policy = document_archive.get_policy(db, current_user.tenant_id)
+    return schemas.RetentionPolicy(hot_days=policy.hot_days if policy else None)
+
+
+@router.put("/retention", response_model=schemas.RetentionPolicy)
+def put_retention(
+    policy: schemas.RetentionPolicy,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Keep documents in the hot table for `hot_days`; older ones are moved to
+    compressed archive segments by the background compaction. They remain
+    searchable with include_archived=true. hot_days null disables archival.
+    """
+    if policy.hot_days is not None and policy.hot_days < 1:
+        raise HTTPException(status_code=400, detail="hot_days must be at least 1.")
+    document_archive.set_policy(db, current_user.tenant_id, policy.hot_days)
+    db.commit()
+    return policy
@@ -1,82 +1,659 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
 
-from auth import get_current_user
-from database import get_db
+from auth import get_current_user, user_from_token
+from database import get_db, SessionLocal
+import admission
+import fraud_rules
+import metrics
 import schemas
 import models
+import tenant_stats
 
 router = APIRouter(prefix="/fraud-detection", tags=["Fraud Detection"])
 
 
-@router.post("/score", response_model=schemas.FraudScore)
-def score_claim(
+# --------- Near-duplicate fingerprinting ---------
+
+# MinHash signature over the description's word set, banded for LSH:
+# NUM_BANDS bands of ROWS_PER_BAND minimums each. Two descriptions with
+# Jaccard similarity 0.8 share at least one band with ~99% probability.
+NUM_BANDS = 6
+ROWS_PER_BAND = 3
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+# Estimated Jaccard similarity required to report a near-duplicate.
+NEAR_DUPLICATE_THRESHOLD = 0.7
+# Upper bound on candidates fetched per band probe (keeps lookups O(1)).
+NEAR_DUPLICATE_CANDIDATES = 25
+# Amount buckets are ~10% wide on a log scale; neighbours are also checked.
+AMOUNT_BUCKET_BASE = 1.1
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+# Fixed permutation parameters so signatures are stable across processes.
+_PERMUTATIONS = [
+    (_hash64(f"minhash-a-{i}") % (_MERSENNE_PRIME - 1) + 1, _hash64(f"minhash-b-{i}") % _MERSENNE_PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+
+def minhash_signature(text: str) -> Optional[List[int]]:
+    """
+    MinHash signature of the set of words in `text`.
+    Returns None when the text has no tokens.
+    """
+    tokens = set(_TOKEN_RE.findall(text.lower()))
+    if not tokens:
+        return None
+
+    hashes = [_hash64(t) for t in tokens]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def signature_bands(signature: List[int]) -> List[int]:
+    """One 56-bit key per band (fits a signed SQLite INTEGER)."""
+    bands: List[int] = []
+    for i in range(NUM_BANDS):
+        rows = signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            b"".join(r.to_bytes(8, "big") for r in rows), digest_size=7
+        ).digest()
+        bands.append(int.from_bytes(digest, "big"))
+    return bands
+
+
+def encode_signature(signature: List[int]) -> str:
+    return ",".join(format(v, "x") for v in signature)
+
+
+def decode_signature(value: str) -> List[int]:
+    return [int(v, 16) for v in value.split(",")]
+
+
+def estimated_jaccard(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def amount_bucket(amount: float) -> int:
+    if amount <= 0:
+        return 0
+    return int(math.log(amount + 1, AMOUNT_BUCKET_BASE))
+
+
+def find_near_duplicate_claims(
+    db: Session,
+    tenant_id: int,
     claim: schemas.ClaimInput,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
+    signature: Optional[List[int]],
+    bucket: int,
+) -> List[models.Claim]:
+    """
+    Looks up earlier claims of the tenant whose description signature reaches
+    NEAR_DUPLICATE_THRESHOLD and whose amount falls in a neighbouring bucket.
+    Each band is an indexed equality probe with a bounded candidate count, so the
+    cost does not grow with the size of the claim history.
     """
-    Simple rule-based fraud risk scoring (demo).
-    You can later swap this with a trained ML model.
-    """
-    score = 0.0
-    reasons: List[str] = []
-
-    # Rule 1: Very high amount
-    if claim.amount > 500000:
-        score += 40
-        reasons.append("Claim amount is very high.")
-    elif claim.amount > 200000:
-        score += 25
-        reasons.append("Claim amount is high.")
-
-    # Rule 2: Previous claims
-    if claim.previous_claims_count > 3:
-        score += 25
-        reasons.append("Customer has many previous claims.")
-    elif claim.previous_claims_count > 1:
-        score += 10
-        reasons.append("Customer has some previous claims.")
-
-    # Rule 3: Suspicious keywords
-    suspicious_keywords = [
-        "sudden",
-        "stolen",
-        "lost",
-        "fire",
-        "cash",
-        "urgent",
-        "fake",
-        "duplicate",
+    if signature is None:
+        return []
+
+    band_columns = [
+        models.Claim.band0,
+        models.Claim.band1,
+        models.Claim.band2,
+        models.Claim.band3,
+        models.Claim.band4,
+        models.Claim.band5,
+    ]
+    candidates = {}
+    for column, band in zip(band_columns, signature_bands(signature)):
+        # One equality probe per bucket: (tenant_id, band, amount_bucket) fully
+        # matches ix_claims_bandN, whose entries end with the rowid, so the
+        # newest candidates come straight from the index. With an IN list the
+        # planner falls back to scanning the tenant's claims to sort by id.
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            rows = (
+                db.query(models.Claim)
+                .filter(
+                    models.Claim.tenant_id == tenant_id,
+                    column == band,
+                    models.Claim.amount_bucket == neighbour,
+                )
+                .order_by(models.Claim.id.desc())
+                .limit(NEAR_DUPLICATE_CANDIDATES)
+                .all()
+            )
+            for row in rows:
+                candidates[row.id] = row
+
+    matches = [
+        row
+        for row in candidates.values()
+        if row.claim_id != claim.claim_id
+        and estimated_jaccard(decode_signature(row.minhash), signature)
+        >= NEAR_DUPLICATE_THRESHOLD
     ]
-    desc_lower = claim.description.lower()
-    keyword_hits = [k for k in suspicious_keywords if k in desc_lower]
-    if keyword_hits:
-        score += 20
-        reasons.append(f"Suspicious keywords found: {', '.join(keyword_hits)}")
-
-    # Rule 4: Third-party claim
-    if claim.is_third_party:
-        score += 10
-        reasons.append("Third-party claim.")
-
-    # Normalize to [0, 100]
-    score = min(score, 100.0)
-
-    if score >= 60:
-        risk_level = "High"
-    elif score >= 30:
-        risk_level = "Medium"
-    else:
-        risk_level = "Low"
-
-    if not reasons:
-        reasons.append("No obvious fraud indicators detected.")
+    matches.sort(key=lambda row: row.id)
+    return matches
+
 
+def store_claim(
+    db: Session,
+    tenant_id: int,
+    claim: schemas.ClaimInput,
+    result: schemas.FraudScore,
+    signature: Optional[List[int]],
+    bucket: int,
+) -> models.Claim:
+    bands: List[Optional[int]] = (
+        signature_bands(signature) if signature is not None else [None] * NUM_BANDS
+    )
+    row = models.Claim(
+        tenant_id=tenant_id,
+        claim_id=claim.claim_id,
+        claimant_id=claim.claimant_id,
+        amount=claim.amount,
+        description=claim.description,
+        is_third_party=claim.is_third_party,
+        risk_level=result.risk_level,
+        score=result.score,
+        reasons_json=json.dumps(result.reasons),
+        amount_bucket=bucket,
+        minhash=encode_signature(signature) if signature is not None else None,
+        band0=bands[0],
+        band1=bands[1],
+        band2=bands[2],
+        band3=bands[3],
+        band4=bands[4],
+        band5=bands[5],
+    )
+    db.add(row)
+    return row
+
+
+def get_stored_claim(db: Session, tenant_id: int, claim_id: str) -> Optional[models.Claim]:
+    return (
+        db.query(models.Claim)
+        .filter(models.Claim.tenant_id == tenant_id, models.Claim.claim_id == claim_id)
+        .first()
+    )
+
+
+def stored_result(row: models.Claim) -> schemas.FraudScore:
     return schemas.FraudScore(
+        claim_id=row.claim_id,
+        risk_level=row.risk_level,
+        score=row.score,
+        reasons=json.loads(row.reasons_json) if row.reasons_json else [],
+    )
+
+
+def remove_duplicate_claims(db: Session, adjust_stats: bool) -> int:
+    """
+    Deletes repeated (tenant_id, claim_id) rows stored before claims were
+    unique, keeping the first, so the unique index can be created. With
+    `adjust_stats` their contribution is taken off the tenant's dashboard
+    counters. Claimant velocity buckets are left as they are: they age out
+    of the rolling windows. The caller commits.
+    """
+    first_ids = select(func.min(models.Claim.id)).group_by(
+        models.Claim.tenant_id, models.Claim.claim_id
+    )
+    duplicates = db.query(models.Claim).filter(models.Claim.id.not_in(first_ids))
+    if adjust_stats:
+        for row in duplicates.with_entities(
+            models.Claim.tenant_id, models.Claim.risk_level, models.Claim.score
+        ):
+            increments = tenant_stats.claim_increments(row.risk_level, row.score)
+            tenant_stats.increment(db, row.tenant_id, {k: -v for k, v in increments.items()})
+    return duplicates.delete(synchronize_session=False)
+
+
+# --------- Claimant velocity aggregates ---------
+
+VELOCITY_WINDOWS = (30, 90, 365)
+
+
+def _velocity_values(stats: Optional[models.ClaimantStats]) -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    for window in VELOCITY_WINDOWS:
+        values[f"claims_{window}d"] = getattr(stats, f"claims_{window}d") if stats else 0
+        values[f"amount_{window}d"] = getattr(stats, f"amount_{window}d") if stats else 0.0
+    return values
+
+
+def _roll_claimant_stats(db: Session, stats: models.ClaimantStats, today: int) -> None:
+    """
+    Slides the rolling windows forward to `today` by subtracting the daily
+    buckets that fell out of each window since `as_of_day`. Each bucket is
+    subtracted once per window, so the amortized cost per claim is O(1).
+    """
+    while stats.as_of_day < today:
+        old_day = stats.as_of_day
+        expired = (
+            db.query(models.ClaimantDailyTotal)
+            .filter(
+                models.ClaimantDailyTotal.tenant_id == stats.tenant_id,
+                models.ClaimantDailyTotal.claimant_id == stats.claimant_id,
+                models.ClaimantDailyTotal.day > old_day - max(VELOCITY_WINDOWS),
+                models.ClaimantDailyTotal.day <= today - min(VELOCITY_WINDOWS),
+            )
+            .all()
+        )
+
+        changes = {models.ClaimantStats.as_of_day: today}
+        for window in VELOCITY_WINDOWS:
+            leaving = [b for b in expired if old_day - window < b.day <= today - window]
+            count_col = getattr(models.ClaimantStats, f"claims_{window}d")
+            amount_col = getattr(models.ClaimantStats, f"amount_{window}d")
+            changes[count_col] = count_col - sum(b.claim_count for b in leaving)
+            changes[amount_col] = amount_col - sum(b.amount_sum for b in leaving)
+
+        # Guarded on as_of_day so a concurrent roll is never applied twice
+        (
+            db.query(models.ClaimantStats)
+            .filter(
+                models.ClaimantStats.id == stats.id,
+                models.ClaimantStats.as_of_day == old_day,
+            )
+            .update(changes, synchronize_session=False)
+        )
+        db.refresh(stats)
+
+
+def get_claimant_velocity(
+    db: Session,
+    tenant_id: int,
+    claimant_id: Optional[str],
+    today: int,
+) -> Dict[str, float]:
+    """
+    Returns the claimant's rolling counts and amount sums (claims_30d, amount_30d, ...)
+    from the single pre-aggregated row, without aggregating over claim history.
+    """
+    if not claimant_id:
+        return _velocity_values(None)
+
+    stats = (
+        db.query(models.ClaimantStats)
+        .filter(
+            models.ClaimantStats.tenant_id == tenant_id,
+            models.ClaimantStats.claimant_id == claimant_id,
+        )
+        # Reload if cached in the session: the upserts bypass the identity map
+        .populate_existing()
+        .first()
+    )
+    if stats is not None:
+        _roll_claimant_stats(db, stats, today)
+    return _velocity_values(stats)
+
+
+def record_claimant_velocity(
+    db: Session,
+    tenant_id: int,
+    claimant_id: Optional[str],
+    amount: float,
+    today: int,
+) -> None:
+    """
+    Adds a claim to the claimant's daily bucket and rolling windows.
+    Must run after get_claimant_velocity() so the windows are current.
+    """
+    if not claimant_id:
+        return
+
+    daily = sqlite_insert(models.ClaimantDailyTotal).values(
+        tenant_id=tenant_id,
+        claimant_id=claimant_id,
+        day=today,
+        claim_count=1,
+        amount_sum=amount,
+    )
+    db.execute(
+        daily.on_conflict_do_update(
+            index_elements=["tenant_id", "claimant_id", "day"],
+            set_={
+                "claim_count": models.ClaimantDailyTotal.claim_count + 1,
+                "amount_sum": models.ClaimantDailyTotal.amount_sum + amount,
+            },
+        )
+    )
+
+    initial = {"tenant_id": tenant_id, "claimant_id": claimant_id, "as_of_day": today}
+    increments = {}
+    for window in VELOCITY_WINDOWS:
+        initial[f"claims_{window}d"] = 1
+        initial[f"amount_{window}d"] = amount
+        increments[f"claims_{window}d"] = getattr(models.ClaimantStats, f"claims_{window}d") + 1
+        increments[f"amount_{window}d"] = getattr(models.ClaimantStats, f"amount_{window}d") + amount
+
+    stats = sqlite_insert(models.ClaimantStats).values(**initial)
+    db.execute(
+        stats.on_conflict_do_update(
+            index_elements=["tenant_id", "claimant_id"],
+            set_=increments,
+        )
+    )
+
+
+# --------- Scoring ---------
+
+
+def evaluate_claim(
+    db: Session,
+    tenant_id: int,
+    claim: schemas.ClaimInput,
+    today: int,
+) -> schemas.FraudScore:
+    """
+    Scores a claim with the tenant's compiled rule set (see fraud_rules.py),
+    then stores it and updates the claimant's velocity aggregates and the
+    tenant's dashboard counters. A claim_id the tenant already scored returns
+    the stored result and changes nothing. The caller commits.
+    """
+    stored = get_stored_claim(db, tenant_id, claim.claim_id)
+    if stored is not None:
+        return stored_result(stored)
+
+    ruleset = fraud_rules.get_ruleset(tenant_id)
+    velocity = get_claimant_velocity(db, tenant_id, claim.claimant_id, today)
+    signature = minhash_signature(claim.description)
+    bucket = amount_bucket(claim.amount)
+
+    # The near-duplicate lookup only runs if the rule set uses it
+    duplicate_ids: List[str] = []
+    if ruleset.features_used & {"near_duplicates", "near_duplicate_ids"}:
+        duplicates = find_near_duplicate_claims(db, tenant_id, claim, signature, bucket)
+        duplicate_ids = list(dict.fromkeys(d.claim_id for d in duplicates))
+
+    features = {
+        "amount": claim.amount,
+        "description": claim.description,
+        "is_third_party": claim.is_third_party,
+        **velocity,
+        "amount_90d_incl_claim": velocity["amount_90d"] + claim.amount,
+        "near_duplicates": len(duplicate_ids),
+        "near_duplicate_ids": ", ".join(duplicate_ids[:5]),
+    }
+    score, risk_level, reasons = ruleset.evaluate(features)
+
+    result = schemas.FraudScore(
         claim_id=claim.claim_id,
         risk_level=risk_level,
         score=score,
         reasons=reasons,
     )
+
+    store_claim(db, tenant_id, claim, result, signature, bucket)
+    record_claimant_velocity(db, tenant_id, claim.claimant_id, claim.amount, today)
+    tenant_stats.increment(db, tenant_id, tenant_stats.claim_increments(risk_level, score))
+    return result
+
+
+# --------- Endpoints ---------
+
+
+@router.post(
+    "/score",
+    response_model=schemas.FraudScore,
+    dependencies=[Depends(admission.limit("fraud_score"))],
+)
+def score_claim(
+    claim: schemas.ClaimInput,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Rule-based fraud risk scoring with the tenant's rule set
+    (defaults unless configured via PUT /fraud-detection/rules).
+    Every scored claim is stored and checked against the tenant's history
+    for near-duplicates. Claim velocity is computed server-side per claimant_id.
+    Retrying a claim_id returns the stored result without counting it again.
+    """
+    today = datetime.utcnow().date().toordinal()
+    result = evaluate_claim(db, current_user.tenant_id, claim, today)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same claim_id first
+        db.rollback()
+        stored = get_stored_claim(db, current_user.tenant_id, claim.claim_id)
+        if stored is None:
+            raise
+        return stored_result(stored)
+    return result
+
+
+@router.get("/rules")
+def get_rules(current_user: models.User = Depends(get_current_user)):
+    """Current fraud rule set of the tenant."""
+    return fraud_rules.get_ruleset(current_user.tenant_id).spec
+
+
+@router.put("/rules")
+def put_rules(
+    rules: Dict[str, Any] = Body(...),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Replace the tenant's fraud rule set. The rules are validated before they are stored."""
+    try:
+        ruleset = fraud_rules.save_tenant_rules(current_user.tenant_id, rules)
+    except (ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid rule set: {exc}")
+    return ruleset.spec
+
+
+@router.delete("/rules")
+def delete_rules(current_user: models.User = Depends(get_current_user)):
+    """Reset the tenant to the default fraud rule set."""
+    fraud_rules.delete_tenant_rules(current_user.tenant_id)
+    return fraud_rules.DEFAULT_RULESET.spec
+
+
+# --------- Streaming (WebSocket) ---------
+
+# A batch is scored when it has STREAM_BATCH_SIZE claims or when the first
+# claim in it has waited STREAM_BATCH_WINDOW seconds, whichever comes first.
+STREAM_BATCH_SIZE = 64
+STREAM_BATCH_WINDOW = 0.005
+# Claims received but not yet scored, per connection. When it is full the
+# connection stops reading, so a fast client is slowed down by TCP flow control.
+STREAM_QUEUE_SIZE = 256
+STREAM_WORKERS = 4
+
+_open_streams: Dict[int, int] = {}
+
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="fraud-stream")
+
+metrics.describe("fraud_stream_connections", "Open fraud scoring WebSocket connections.")
+metrics.describe("fraud_stream_batches_total", "Micro-batches scored on fraud scoring streams.")
+metrics.describe("fraud_stream_claims_total", "Claims scored on fraud scoring streams.")
+
+# A parsed claim, or an error reply to send back in order
+StreamItem = Union[schemas.ClaimInput, Dict[str, Any]]
+
+
+def _stream_token(websocket: WebSocket, token: Optional[str]) -> Optional[str]:
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+
+def _authenticate(token: str) -> Optional[Tuple[int, int]]:
+    db = SessionLocal()
+    try:
+        user = user_from_token(db, token)
+        return (user.id, user.tenant_id) if user is not None else None
+    finally:
+        db.close()
+
+
+def _parse_stream_message(raw: str) -> List[StreamItem]:
+    """One message holds a ClaimInput object or a list of them."""
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return [{"claim_id": None, "error": "Invalid JSON."}]
+
+    items: List[StreamItem] = []
+    for obj in data if isinstance(data, list) else [data]:
+        try:
+            items.append(schemas.ClaimInput.parse_obj(obj))
+        except ValidationError as exc:
+            claim_id = obj.get("claim_id") if isinstance(obj, dict) else None
+            items.append({"claim_id": claim_id, "error": f"Invalid claim: {exc.errors()}"})
+    return items
+
+
+def _claim_error(claim: schemas.ClaimInput) -> Dict[str, Any]:
+    return {"claim_id": claim.claim_id, "error": "Could not score claim."}
+
+
+def _score_batch(db: Session, tenant_id: int, claims: List[schemas.ClaimInput]) -> List[Dict[str, Any]]:
+    """
+    Scores a micro-batch and commits it once. Each claim runs in its own
+    savepoint, so a failing claim only rolls back itself. Runs on the stream
+    executor.
+    """
+    today = datetime.utcnow().date().toordinal()
+    results: List[Dict[str, Any]] = []
+    try:
+        # Take the write lock up front; pysqlite does not BEGIN before a
+        # SAVEPOINT, which would otherwise commit on release
+        db.execute(text("BEGIN IMMEDIATE"))
+        for claim in claims:
+            try:
+                with db.begin_nested():
+                    result = evaluate_claim(db, tenant_id, claim, today)
+                    db.flush()  # later claims in the batch must see this one
+                results.append(result.dict())
+            except Exception:
+                results.append(_claim_error(claim))
+        db.commit()
+    except Exception:
+        db.rollback()
+        return [_claim_error(claim) for claim in claims]
+    return results
+
+
+@router.websocket("/stream")
+async def score_stream(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Real-time fraud scoring for intake systems. Authenticate once with
+    `?token=<access token>` or an `Authorization: Bearer` header, then send
+    ClaimInput JSON messages (an object or a list of objects). Claims are
+    micro-batched, scored with the tenant's rule set and committed once per
+    batch. Each claim gets one reply, in the order the claims were sent:
+    a FraudScore, or {"claim_id": ..., "error": ...}.
+
+    Streams share the tenant's "fraud_score" admission budget: an open stream
+    holds one concurrency slot (the connection is closed with 1013 when none
+    is free) and every claim costs one token. Claims over the rate limit are
+    answered with an error carrying `retry_after` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    raw_token = _stream_token(websocket, token)
+    identity = await loop.run_in_executor(_stream_executor, _authenticate, raw_token) if raw_token else None
+    if identity is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    _, tenant_id = identity
+    if not await admission.try_acquire_slot(tenant_id, "fraud_score"):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    db = SessionLocal()
+
+    async def receive():
+        try:
+            while True:
+                for item in _parse_stream_message(await websocket.receive_text()):
+                    await queue.put(item)  # blocks while the scorer is behind
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await queue.put(None)
+
+    async def next_batch() -> Tuple[List[StreamItem], bool]:
+        """Returns (items, stream ended)."""
+        first = await queue.get()
+        if first is None:
+            return [], True
+        items: List[StreamItem] = [first]
+        deadline = time.monotonic() + STREAM_BATCH_WINDOW
+        while len(items) < STREAM_BATCH_SIZE:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return items, True
+            items.append(item)
+        return items, False
+
+    receiver = asyncio.create_task(receive())
+    _open_streams[tenant_id] = _open_streams.get(tenant_id, 0) + 1
+    metrics.set_gauge("fraud_stream_connections", _open_streams[tenant_id], tenant=tenant_id)
+    try:
+        ended = False
+        while not ended:
+            items, ended = await next_batch()
+            claims = [i for i in items if isinstance(i, schemas.ClaimInput)]
+            retry_after = admission.charge(tenant_id, "fraud_score", len(claims)) if claims else 0.0
+            if retry_after:
+                # Over the tenant's rate: answer the batch's claims instead of scoring them
+                rejected = {"error": "Rate limit exceeded for this tenant.", "retry_after": round(retry_after, 3)}
+                items = [
+                    {"claim_id": i.claim_id, **rejected} if isinstance(i, schemas.ClaimInput) else i
+                    for i in items
+                ]
+                claims = []
+            scored = iter(
+                await loop.run_in_executor(_stream_executor, _score_batch, db, tenant_id, claims)
+                if claims
+                else []
+            )
+            if claims:
+                metrics.inc("fraud_stream_batches_total", tenant=tenant_id)
+                metrics.inc("fraud_stream_claims_total", len(claims), tenant=tenant_id)
+            for item in items:
+                reply = next(scored) if isinstance(item, schemas.ClaimInput) else item
+                await websocket.send_text(json.dumps(reply))
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # client went away while replies were being sent
+    finally:
+        receiver.cancel()
+        admission.release_slot(tenant_id, "fraud_score")
+        _open_streams[tenant_id] -= 1
+        metrics.set_gauge("fraud_stream_connections", _open_streams[tenant_id], tenant=tenant_id)
+        db.close()
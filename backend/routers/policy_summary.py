@@ -6,6 +6,7 @@ import pdfplumber
 
 from auth import get_current_user
 from database import get_db
+import admission
 import schemas
 import models
 
@@ -29,7 +30,11 @@ def simple_summarize(text: str, max_words: int = 200) -> str:
     return " ".join(words[:max_words])
 
 
-@router.post("/summarize", response_model=schemas.PolicySummaryResponse)
+@router.post(
+    "/summarize",
+    response_model=schemas.PolicySummaryResponse,
+    dependencies=[Depends(admission.limit("summarize"))],
+)
 async def summarize_policy(
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user),
@@ -57,6 +57,9 @@ class ClaimInput(BaseModel):
     amount: float
     description: str
     is_third_party: bool = False
+    # Policyholder / customer identifier used for server-side claim velocity
+    claimant_id: Optional[str] = None
+    # Deprecated: ignored, previous claims are counted server-side per claimant_id
     previous_claims_count: int = 0
 
 
@@ -94,19 +97,45 @@ class PageType(BaseModel):
     confidence: float
 
 
+class HighlightSpan(BaseModel):
+    page: int  # 1-based
+    start: int  # character offsets into the page text
+    end: int
+    label: str  # "keyword" or the extracted field name
+
+
 class DocClassAnalysisResponse(BaseModel):
-    doc_type: str
-    confidence: float
-    keywords_matched: List[str]
-    engine_breakdown: Dict[str, float]  # keyword / semantic / layout / final
+    # Every section is optional: with `fields=` only the requested ones are returned
+    doc_type: Optional[str] = None
+    confidence: Optional[float] = None
+    keywords_matched: Optional[List[str]] = None
+    engine_breakdown: Optional[Dict[str, float]] = None  # keyword / semantic / layout / final
 
-    extracted_fields: List[ExtractionField]
-    fraud_signals: List[FraudSignal]
-    tags: List[str]
+    extracted_fields: Optional[List[ExtractionField]] = None
+    fraud_signals: Optional[List[FraudSignal]] = None
+    tags: Optional[List[str]] = None
 
-    quality_score: float  # 0–100
-    similar_docs: List[SimilarDoc]
-    page_map: List[PageType]
+    quality_score: Optional[float] = None  # 0–100
+    similar_docs: Optional[List[SimilarDoc]] = None
+    page_map: Optional[List[PageType]] = None
 
     # For frontend text highlighting
-    highlight_phrases: List[str]
+    highlight_phrases: Optional[List[str]] = None
+    highlight_spans: Optional[List[HighlightSpan]] = None
+
+
+class RetentionPolicy(BaseModel):
+    # Days documents stay in the hot table; None keeps everything hot
+    hot_days: Optional[int] = None
+
+
+# ------------ DASHBOARD ------------
+
+class DashboardStats(BaseModel):
+    documents_total: int
+    documents_by_type: Dict[str, int]
+    documents_fraud_review: int
+    average_quality_score: Optional[float] = None
+    claims_total: int
+    claims_by_risk: Dict[str, int]  # High / Medium / Low
+    average_claim_score: Optional[float] = None
@@ -0,0 +1,300 @@
+"""
+CPU-only semantic document classifier.
+
+Documents are turned into signed, hashed word + bigram features and scored with
+a multinomial logistic regression held in NumPy arrays. The model is trained
+from the stored `Document` rows (their `doc_type` is the label) and saved to
+MODEL_PATH; running processes pick up a new model file automatically.
+
+    python semantic_engine.py train [--tenant-id N] [--epochs N]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MODEL_PATH = os.getenv("SEMANTIC_MODEL_PATH", "./semantic_model.npz")
+N_FEATURES = 2 ** 18
+MAX_TOKENS = 1000  # per document; only the text needed for these is lowercased and scanned
+RELOAD_CHECK_SECONDS = 2.0
+# Minimum class probability for the semantic engine to override the keyword engine
+OVERRIDE_CONFIDENCE = 0.8
+
+# Bumped when hashing changes: models trained on other features are not loaded
+FEATURE_VERSION = 2
+
+# Token characters are [a-z0-9]; every other UTF-8 byte separates tokens
+_TOKEN_BYTES = bytes(b if 48 <= b <= 57 or 97 <= b <= 122 else 32 for b in range(256))
+_SIGN_BIT = np.uint32(0x80000000)
+# Tokens are hashed on their first _HASH_WIDTH bytes, one 64-bit word at a time
+_HASH_WIDTH = 32
+_HASH_MIX = tuple(
+    np.uint64(m) for m in (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+)
+
+
+# --------- Features ---------
+
+
+def tokenize(text: str) -> List[bytes]:
+    """
+    The first MAX_TOKENS lowercase [a-z0-9]+ tokens. Only a prefix of the text
+    is lowercased and split, grown until it holds more than MAX_TOKENS tokens
+    (so the token cut at its end is never used) or covers the whole text.
+    """
+    limit = MAX_TOKENS * 8
+    while True:
+        tokens = text[:limit].lower().encode("utf-8").translate(_TOKEN_BYTES).split()
+        if len(tokens) > MAX_TOKENS or limit >= len(text):
+            return tokens[:MAX_TOKENS]
+        limit *= 4
+
+
+def _mix(words: np.ndarray) -> np.ndarray:
+    """32-bit hashes of the rows of a uint64 matrix."""
+    acc = np.zeros(len(words), dtype=np.uint64)
+    for column in range(words.shape[1]):
+        acc = (acc ^ words[:, column]) * _HASH_MIX[column]
+    return (acc >> np.uint64(32)).astype(np.uint32)
+
+
+def hash_features_batch(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (feature indices, values, row ids) for a batch of documents: hashed
+    unigrams and bigrams, sublinear term frequency, L2-normalised per row.
+    Past tokenization the whole batch is hashed and counted in NumPy; bigram
+    hashes are mixed from their two unigram hashes.
+    """
+    token_lists = [tokenize(text) for text in texts]
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(texts))
+    flat = [token for tokens in token_lists for token in tokens]
+    words = np.array(flat, dtype=f"S{_HASH_WIDTH}").view(np.uint64).reshape(-1, _HASH_WIDTH // 8)
+    unigrams = _mix(words)
+    unigram_rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+    same_row = unigram_rows[:-1] == unigram_rows[1:]
+    bigrams = _mix(np.stack([unigrams[:-1][same_row], unigrams[1:][same_row]], axis=1).astype(np.uint64))
+
+    hashes = np.concatenate([unigrams, bigrams])
+    rows = np.concatenate([unigram_rows, unigram_rows[:-1][same_row]])
+    signs = np.where(hashes & _SIGN_BIT, -1.0, 1.0)
+    keys, inverse = np.unique(rows * N_FEATURES + hashes.astype(np.int64) % N_FEATURES, return_inverse=True)
+    counts = np.bincount(inverse, weights=signs, minlength=len(keys))
+
+    values = np.sign(counts) * np.log1p(np.abs(counts))
+    key_rows = keys // N_FEATURES
+    norms = np.sqrt(np.bincount(key_rows, weights=values * values, minlength=len(texts)))
+    values /= np.where(norms > 0, norms, 1.0)[key_rows]
+    return keys % N_FEATURES, values.astype(np.float32), key_rows
+
+
+def hash_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(feature indices, values) for one document; see hash_features_batch."""
+    indices, values, _ = hash_features_batch([text])
+    return indices, values
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# --------- Model ---------
+
+
+class SemanticModel:
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.weights = weights  # (N_FEATURES, n_labels)
+        self.bias = bias  # (n_labels,)
+
+    def _logits(self, indices: np.ndarray, values: np.ndarray, rows: np.ndarray, n: int) -> np.ndarray:
+        contributions = self.weights[indices] * values[:, None]
+        logits = np.tile(self.bias, (n, 1))
+        for label in range(len(self.labels)):
+            logits[:, label] += np.bincount(rows, weights=contributions[:, label], minlength=n)
+        return logits
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Class probabilities, shape (len(texts), len(labels)), featurized and scored as one batch."""
+        if not texts:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        indices, values, rows = hash_features_batch(texts)
+        return _softmax(self._logits(indices, values, rows, len(texts)))
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(best label, probability) per text."""
+        probs = self.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    def probability_of(self, probs: np.ndarray, label: str) -> float:
+        if label not in self.labels:
+            return 0.0
+        return float(probs[self.labels.index(label)])
+
+    def save(self, path: str) -> None:
+        """Writes the model atomically (temp file + rename) so readers never see a partial file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    feature_version=np.array(FEATURE_VERSION),
+                    labels=np.array(self.labels),
+                    weights=self.weights,
+                    bias=self.bias,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "SemanticModel":
+        with np.load(path, allow_pickle=False) as data:
+            if "feature_version" not in data.files or int(data["feature_version"]) != FEATURE_VERSION:
+                raise ValueError("Model was trained on other features; retrain it.")
+            return cls(
+                labels=[str(label) for label in data["labels"]],
+                weights=data["weights"],
+                bias=data["bias"],
+            )
+
+
+def train(
+    texts: Sequence[str],
+    labels: Sequence[str],
+    epochs: int = 40,
+    learning_rate: float = 2.0,
+    l2: float = 1e-5,
+    batch_size: int = 256,
+) -> SemanticModel:
+    """Mini-batch gradient descent on softmax cross-entropy."""
+    classes = sorted(set(labels))
+    if len(classes) < 2:
+        raise ValueError("Need documents of at least two doc types to train.")
+
+    y = np.array([classes.index(label) for label in labels])
+    features = [hash_features(t) for t in texts]
+    weights = np.zeros((N_FEATURES, len(classes)), dtype=np.float32)
+    bias = np.zeros(len(classes), dtype=np.float32)
+    model = SemanticModel(classes, weights, bias)
+    rng = np.random.default_rng(0)
+
+    for _ in range(epochs):
+        order = rng.permutation(len(texts))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            indices = np.concatenate([features[i][0] for i in batch])
+            values = np.concatenate([features[i][1] for i in batch])
+            rows = np.concatenate(
+                [np.full(len(features[i][0]), r, dtype=np.int64) for r, i in enumerate(batch)]
+            )
+
+            probs = _softmax(model._logits(indices, values, rows, len(batch)))
+            probs[np.arange(len(batch)), y[batch]] -= 1.0
+            probs /= len(batch)
+
+            # Sparse update: only the features present in this batch
+            grad = values[:, None] * probs[rows]
+            touched, inverse = np.unique(indices, return_inverse=True)
+            grad_touched = np.zeros((len(touched), len(classes)), dtype=np.float32)
+            np.add.at(grad_touched, inverse, grad)
+            weights[touched] -= learning_rate * (grad_touched + l2 * weights[touched])
+            bias -= learning_rate * probs.sum(axis=0)
+
+    return model
+
+
+# --------- Hot-reloaded model ---------
+
+_model: Optional[SemanticModel] = None
+_model_mtime: Optional[int] = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def get_model() -> Optional[SemanticModel]:
+    """
+    Returns the current model (None if no model has been trained yet).
+    The model file is re-checked at most every RELOAD_CHECK_SECONDS; a changed
+    file is loaded fully before the reference is swapped, so callers always
+    see either the old or the new model.
+    """
+    global _model, _model_mtime, _last_check
+
+    now = time.monotonic()
+    if now - _last_check < RELOAD_CHECK_SECONDS:
+        return _model
+
+    with _lock:
+        if now - _last_check < RELOAD_CHECK_SECONDS:
+            return _model
+        _last_check = now
+        try:
+            mtime = os.stat(MODEL_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime != _model_mtime:
+            if mtime is None:
+                _model = None
+            else:
+                try:
+                    _model = SemanticModel.load(MODEL_PATH)
+                except (OSError, ValueError, KeyError):
+                    # Keep serving the previous model if the new file is unreadable
+                    return _model
+            _model_mtime = mtime
+
+    return _model
+
+
+# --------- CLI ---------
+
+
+def train_from_database(tenant_id: Optional[int] = None, epochs: int = 40) -> SemanticModel:
+    from database import SessionLocal
+    import models
+
+    db = SessionLocal()
+    try:
+        query = db.query(models.Document.text_content, models.Document.doc_type)
+        if tenant_id is not None:
+            query = query.filter(models.Document.tenant_id == tenant_id)
+        rows = query.all()
+    finally:
+        db.close()
+
+    return train([r.text_content for r in rows], [r.doc_type for r in rows], epochs=epochs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Semantic document classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="Train from stored documents and save the model")
+    train_cmd.add_argument("--tenant-id", type=int, default=None)
+    train_cmd.add_argument("--epochs", type=int, default=40)
+    train_cmd.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    model = train_from_database(args.tenant_id, args.epochs)
+    model.save(args.output)
+    print(
+        f"Trained on labels {model.labels} in {time.perf_counter() - started:.1f}s "
+        f"-> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
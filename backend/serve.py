@@ -0,0 +1,127 @@
+"""
+Multi-worker (pre-fork) server.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker imports the
+app, compiles its tables and loads the semantic model on its own. This runner
+instead imports and warms everything once in the parent, freezes those objects
+out of the garbage collector, and then forks the workers. The read-only
+structures (keyword and regex tables, compiled fraud rules, the semantic model
+arrays) stay in shared copy-on-write pages, so memory stays roughly flat as
+workers are added. Hot lookups (authenticated users) go through the SQLite
+backed shared_cache, which all workers share and which survives restarts.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Crashed workers are replaced; SIGINT / SIGTERM shut all workers down.
+Admission-control lanes and /metrics are per worker.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+
+def preload():
+    """Imports the app and builds all read-only structures before forking."""
+    import main
+    import database
+    import fraud_rules
+    import semantic_engine
+
+    semantic_engine.get_model()
+    fraud_rules.preload()
+
+    # Connections must not be shared with the children
+    database.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str) -> None:
+    # Restore default signal handling; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, log_level)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the backend with pre-forked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    app = preload()
+    sock = bind_socket(args.host, args.port)
+
+    workers: Dict[int, float] = {}
+    for _ in range(args.workers):
+        workers[spawn(app, sock, args.log_level)] = time.monotonic()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers", flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        # Back off if workers die right after starting (e.g. a broken deploy)
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        workers[spawn(app, sock, args.log_level)] = time.monotonic()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Cross-process key/value cache backed by a local SQLite file (WAL mode).
+
+All workers on the box read and write the same file, so a lookup cached by one
+worker is a hit for the others, and entries survive worker restarts. Values are
+stored as JSON with a per-entry expiry. Keys are scoped to the application
+database, so apps on different databases can share the cache file without
+seeing each other's rows.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from database import engine
+import metrics
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "./shared_cache.db")
+
+
+def _database_scope() -> str:
+    url = engine.url
+    if url.get_backend_name() == "sqlite" and url.database:
+        # Relative paths resolve against the working directory
+        identity = "sqlite:" + os.path.abspath(url.database)
+    else:
+        identity = url.render_as_string(hide_password=True)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:12]
+
+
+_SCOPE = _database_scope()
+
+metrics.describe("shared_cache_requests_total", "Shared cache lookups by namespace and result.")
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    # One connection per thread and per process (connections must not cross a fork)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(SHARED_CACHE_PATH, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _key(namespace: str, key: str) -> str:
+    return f"{_SCOPE}:{namespace}:{key}"
+
+
+def get(namespace: str, key: str) -> Optional[Any]:
+    try:
+        row = _connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (_key(namespace, key),)
+        ).fetchone()
+    except sqlite3.Error:
+        row = None
+
+    if row is None or row[1] < time.time():
+        metrics.inc("shared_cache_requests_total", namespace=namespace, result="miss")
+        return None
+    metrics.inc("shared_cache_requests_total", namespace=namespace, result="hit")
+    return json.loads(row[0])
+
+
+def put(namespace: str, key: str, value: Any, ttl: float) -> None:
+    try:
+        _connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (_key(namespace, key), json.dumps(value), time.time() + ttl),
+        )
+    except sqlite3.Error:
+        pass  # the cache is best effort
+
+
+def delete(namespace: str, key: str) -> None:
+    try:
+        _connection().execute("DELETE FROM cache WHERE key = ?", (_key(namespace, key),))
+    except sqlite3.Error:
+        pass
+
@@ -0,0 +1,141 @@
+"""
+Incrementally maintained per-tenant dashboard aggregates.
+
+Every stored document and scored claim adds its contribution to a few named
+counters in `tenant_metrics`, in the same transaction as the row itself. The
+dashboard then reads one small row set per tenant instead of aggregating over
+the tenant's full history.
+
+Metric names:
+    docs_total, docs_by_type:<type>, docs_fraud_review,
+    docs_quality_sum, docs_quality_count (documents with a stored quality score)
+    claims_total, claims_by_risk:<level>, claims_score_sum
+
+On a database that predates the counters, backfill() seeds them once from the
+existing rows.
+"""
+
+from collections import Counter
+from typing import Dict, Mapping
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+
+DOCS_BY_TYPE = "docs_by_type:"
+CLAIMS_BY_RISK = "claims_by_risk:"
+
+
+def document_increments(doc_type: str, quality_score: float, fraud_review: bool) -> Counter:
+    return Counter({
+        "docs_total": 1,
+        DOCS_BY_TYPE + doc_type: 1,
+        "docs_fraud_review": 1 if fraud_review else 0,
+        "docs_quality_sum": quality_score,
+        "docs_quality_count": 1,
+    })
+
+
+def claim_increments(risk_level: str, score: float) -> Counter:
+    return Counter({
+        "claims_total": 1,
+        CLAIMS_BY_RISK + risk_level: 1,
+        "claims_score_sum": score,
+    })
+
+
+def increment(db: Session, tenant_id: int, increments: Mapping[str, float]) -> None:
+    """Adds `increments` to the tenant's counters with one upsert. The caller commits."""
+    rows = [
+        {"tenant_id": tenant_id, "name": name, "value": value}
+        for name, value in increments.items()
+        if value
+    ]
+    if not rows:
+        return
+    stmt = sqlite_insert(models.TenantMetric).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "name"],
+            set_={"value": models.TenantMetric.value + stmt.excluded.value},
+        )
+    )
+
+
+def backfill(db: Session) -> None:
+    """
+    Seeds the counters from the existing documents and claims with aggregate
+    inserts. Run once, when the tenant_metrics table is created on an existing
+    database. Documents stored before analyses were persisted only count
+    towards the totals and types. The caller commits.
+    """
+    doc = models.Document
+    claim = models.Claim
+    quality = func.json_extract(doc.analysis_json, "$.quality_score")
+    aggregates = [
+        select(doc.tenant_id, literal("docs_total"), func.count()).group_by(doc.tenant_id),
+        select(doc.tenant_id, literal(DOCS_BY_TYPE) + doc.doc_type, func.count())
+        .group_by(doc.tenant_id, doc.doc_type),
+        select(doc.tenant_id, literal("docs_fraud_review"), func.count())
+        .where(func.json_array_length(doc.analysis_json, "$.fraud_signals") > 0)
+        .group_by(doc.tenant_id),
+        select(doc.tenant_id, literal("docs_quality_sum"), func.sum(quality))
+        .where(quality.isnot(None))
+        .group_by(doc.tenant_id),
+        select(doc.tenant_id, literal("docs_quality_count"), func.count())
+        .where(quality.isnot(None))
+        .group_by(doc.tenant_id),
+        select(claim.tenant_id, literal("claims_total"), func.count()).group_by(claim.tenant_id),
+        select(claim.tenant_id, literal(CLAIMS_BY_RISK) + claim.risk_level, func.count())
+        .group_by(claim.tenant_id, claim.risk_level),
+        select(claim.tenant_id, literal("claims_score_sum"), func.sum(claim.score))
+        .group_by(claim.tenant_id),
+    ]
+    for aggregate in aggregates:
+        db.execute(
+            insert(models.TenantMetric).from_select(
+                ["tenant_id", "name", "value"],
+                aggregate.where(aggregate.selected_columns[0].isnot(None)),
+            )
+        )
+
+
+def read(db: Session, tenant_id: int) -> Dict[str, float]:
+    rows = (
+        db.query(models.TenantMetric.name, models.TenantMetric.value)
+        .filter(models.TenantMetric.tenant_id == tenant_id)
+        .all()
+    )
+    return {name: value for name, value in rows}
+
+
+def dashboard_stats(db: Session, tenant_id: int) -> schemas.DashboardStats:
+    values = read(db, tenant_id)
+    docs_total = int(values.get("docs_total", 0))
+    quality_count = int(values.get("docs_quality_count", 0))
+    claims_total = int(values.get("claims_total", 0))
+
+    return schemas.DashboardStats(
+        documents_total=docs_total,
+        documents_by_type={
+            name[len(DOCS_BY_TYPE):]: int(value)
+            for name, value in values.items()
+            if name.startswith(DOCS_BY_TYPE)
+        },
+        documents_fraud_review=int(values.get("docs_fraud_review", 0)),
+        average_quality_score=(
+            round(values.get("docs_quality_sum", 0.0) / quality_count, 2) if quality_count else None
+        ),
+        claims_total=claims_total,
+        claims_by_risk={
+            name[len(CLAIMS_BY_RISK):]: int(value)
+            for name, value in values.items()
+            if name.startswith(CLAIMS_BY_RISK)
+        },
+        average_claim_score=(
+            round(values.get("claims_score_sum", 0.0) / claims_total, 2) if claims_total else None
+        ),
+    )
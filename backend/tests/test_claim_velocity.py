@@ -0,0 +1,114 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from routers import fraud_detection
+import fraud_rules
+import models
+import schemas
+import tenant_stats
+
+DAY = 740000
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(fraud_rules, "RULES_DIR", str(tmp_path / "rules"))
+    monkeypatch.setattr(fraud_rules, "_cache", {})
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.Tenant(id=1, name="t1"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def brute_force_velocity(history, claimant_id, today):
+    values = {}
+    for window in fraud_detection.VELOCITY_WINDOWS:
+        in_window = [amount for day, who, amount in history if who == claimant_id and today - window < day <= today]
+        values[f"claims_{window}d"] = len(in_window)
+        values[f"amount_{window}d"] = sum(in_window)
+    return values
+
+
+def test_rolling_windows_match_brute_force_sums(db):
+    rng = random.Random(27)
+    claimants = ["alice", "bob", "carol"]
+    history = []
+    today = DAY
+    for step in range(400):
+        today += rng.choice([0, 0, 1, 2, 7, 29, 30, 31, 60, 89, 90, 91, 200, 364, 365, 366])
+        claimant_id = rng.choice(claimants)
+        velocity = fraud_detection.get_claimant_velocity(db, 1, claimant_id, today)
+        expected = brute_force_velocity(history, claimant_id, today)
+        assert velocity == pytest.approx(expected, abs=1e-6), f"step {step}"
+
+        if rng.random() < 0.8:
+            amount = round(rng.uniform(10, 5000), 2)
+            fraud_detection.record_claimant_velocity(db, 1, claimant_id, amount, today)
+            history.append((today, claimant_id, amount))
+        if rng.random() < 0.5:
+            db.commit()
+    db.commit()
+
+    for claimant_id in claimants:
+        velocity = fraud_detection.get_claimant_velocity(db, 1, claimant_id, today + 45)
+        assert velocity == pytest.approx(brute_force_velocity(history, claimant_id, today + 45), abs=1e-6)
+
+
+def test_rescoring_a_claim_id_returns_the_stored_result_once(db):
+    claim = schemas.ClaimInput(
+        claim_id="c-1", amount=120000.0, description="paid in cash after the fire", claimant_id="alice"
+    )
+    first = fraud_detection.evaluate_claim(db, 1, claim, DAY)
+    db.commit()
+    retried = schemas.ClaimInput(claim_id="c-1", amount=5.0, description="different", claimant_id="alice")
+    second = fraud_detection.evaluate_claim(db, 1, retried, DAY + 1)
+    db.commit()
+
+    assert second == first
+    assert db.query(models.Claim).count() == 1
+    velocity = fraud_detection.get_claimant_velocity(db, 1, "alice", DAY + 1)
+    assert velocity["claims_30d"] == 1
+    assert velocity["amount_30d"] == pytest.approx(120000.0)
+    stats = tenant_stats.read(db, 1)
+    assert stats["claims_total"] == 1
+    assert stats["claims_score_sum"] == pytest.approx(first.score)
+
+
+def test_duplicate_claim_migration_keeps_the_first_row_and_adjusts_stats(db):
+    db.execute(text("DROP INDEX uq_claims_tenant_claim"))
+    for claim_id, amount in [("c-1", 100.0), ("c-2", 600000.0)]:
+        claim = schemas.ClaimInput(claim_id=claim_id, amount=amount, description="water damage in kitchen")
+        fraud_detection.evaluate_claim(db, 1, claim, DAY)
+    db.commit()
+    expected_stats = tenant_stats.read(db, 1)
+    first_ids = {row.claim_id: row.id for row in db.query(models.Claim)}
+
+    # Retries stored before claims were unique, each counted again
+    for claim_id in ["c-1", "c-2", "c-2"]:
+        row = db.query(models.Claim).filter(models.Claim.id == first_ids[claim_id]).one()
+        fraud_detection.store_claim(
+            db,
+            1,
+            schemas.ClaimInput(claim_id=claim_id, amount=row.amount, description=row.description),
+            fraud_detection.stored_result(row),
+            None,
+            row.amount_bucket,
+        )
+        tenant_stats.increment(db, 1, tenant_stats.claim_increments(row.risk_level, row.score))
+    db.commit()
+    assert db.query(models.Claim).count() == 5
+
+    assert fraud_detection.remove_duplicate_claims(db, adjust_stats=True) == 3
+    db.commit()
+
+    assert {row.claim_id: row.id for row in db.query(models.Claim)} == first_ids
+    assert tenant_stats.read(db, 1) == pytest.approx(expected_stats)
+    # The unique index can now be created
+    next(ix for ix in models.Claim.__table__.indexes if ix.name == "uq_claims_tenant_claim").create(db.connection())
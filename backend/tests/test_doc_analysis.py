@@ -0,0 +1,36 @@
+from routers.doc_classification import DocumentAnalysis, PAGE_SEPARATOR
+
+PAGES = [
+    "TAX INVOICE\nInvoice No: INV-7\nAmount Due: 118.00\nGST 18%",
+    "Claim number: C-1\nPolicy number: P-9\nsee invoice INV-7",
+]
+
+
+def analysis() -> DocumentAnalysis:
+    return DocumentAnalysis(
+        page_texts=PAGES,
+        full_text=PAGE_SEPARATOR.join(PAGES),
+        is_pdf=True,
+        db=None,
+        tenant_id=1,
+    )
+
+
+def test_doc_type_and_confidence_skip_unrequested_stages():
+    doc = analysis()
+    response = doc.build_response(["doc_type", "confidence"])
+
+    assert response.doc_type == "Invoice"
+    computed = set(vars(doc))
+    for stage in ("extracted_fields", "_match_spans", "highlight_spans", "_page_predictions", "page_map"):
+        assert stage not in computed
+
+
+def test_highlight_spans_cover_every_occurrence():
+    doc = analysis()
+    spans = [(s.page, s.start, s.end, s.label) for s in doc.highlight_spans]
+
+    assert (1, 24, 29, "Invoice Number") in spans
+    # Second occurrence of the invoice number, on page 2
+    assert (2, PAGES[1].index("INV-7"), PAGES[1].index("INV-7") + 5, "Invoice Number") in spans
+    assert sum(1 for s in spans if s[3] == "keyword" and PAGES[s[0] - 1][s[1]:s[2]].lower() == "invoice") == 3
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import document_archive
+import document_export
+import models
+
+NOW = datetime(2024, 6, 1)
+OLD = NOW - timedelta(days=100)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(document_archive, "SessionLocal", session_factory)
+    monkeypatch.setattr(document_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(document_archive, "_recovered", set())
+
+    db = session_factory()
+    db.add(models.Tenant(id=1, name="t1"))
+    document_archive.set_policy(db, 1, hot_days=30)
+    db.commit()
+    yield engine, db
+    db.close()
+
+
+def add_documents(db, count, created_at):
+    docs = [
+        models.Document(tenant_id=1, filename=f"f{i}.txt", doc_type="Invoice", text_content="x", created_at=created_at)
+        for i in range(count)
+    ]
+    db.add_all(docs)
+    db.commit()
+    return [doc.id for doc in docs]
+
+
+def hot_ids(db):
+    db.expire_all()
+    return sorted(row.id for row in db.query(models.Document.id))
+
+
+def test_new_documents_survive_recovery_after_archiving_the_highest_ids(archive):
+    _, db = archive
+    archived = add_documents(db, 3, OLD)
+    assert document_archive.compact_step(NOW) == 3
+    assert hot_ids(db) == []
+
+    fresh = add_documents(db, 3, NOW)
+    assert min(fresh) > max(archived)
+
+    document_archive._recovered.clear()  # as after a restart
+    assert document_archive.compact_step(NOW) == 0
+    assert hot_ids(db) == fresh
+    assert [doc["id"] for doc in document_archive.iter_archived_documents(1)] == archived
+
+
+def test_recovery_deletes_only_rows_matching_the_last_segment(archive):
+    _, db = archive
+    ids = add_documents(db, 3, OLD)
+    rows = db.query(*document_export.EXPORT_COLUMNS.values()).filter(models.Document.id.in_(ids[:2])).all()
+    docs = document_export.document_rows(rows)
+    docs[1]["created_at"] = (OLD - timedelta(days=1)).isoformat()  # archived a different row with this id
+    document_archive.write_segment(1, docs)  # crash before the rows were deleted
+
+    document_archive._recover_last_segment(db, 1, NOW - timedelta(days=30))
+    assert hot_ids(db) == ids[1:]
+
+
+def test_write_segment_refuses_to_overwrite(archive):
+    document_archive.write_segment(1, [{"id": 1}, {"id": 3}])
+    with pytest.raises(FileExistsError):
+        document_archive.write_segment(1, [{"id": 1}, {"id": 3}])
+    assert [doc["id"] for doc in document_archive.iter_archived_documents(1)] == [1, 3]
+
+
+def test_migration_moves_ids_past_the_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    document_archive.write_segment(1, [{"id": 5}, {"id": 10}])
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY, tenant_id INTEGER, filename VARCHAR NOT NULL,"
+            " doc_type VARCHAR NOT NULL, text_content TEXT NOT NULL, analysis_json TEXT, created_at DATETIME)"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_documents_tenant_id ON documents (tenant_id)")
+        conn.exec_driver_sql(
+            "INSERT INTO documents (id, tenant_id, filename, doc_type, text_content) VALUES (2, 1, 'a', 'Invoice', 'x')"
+        )
+
+    document_archive.migrate_document_ids(engine)
+    document_archive.migrate_document_ids(engine)  # already migrated: no-op
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO documents (tenant_id, filename, doc_type, text_content) VALUES (1, 'b', 'Invoice', 'x')"
+        )
+        assert [row[0] for row in conn.execute(text("SELECT id FROM documents ORDER BY id"))] == [2, 11]
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'documents'")).scalar()
+        assert "AUTOINCREMENT" in sql
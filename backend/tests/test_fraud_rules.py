@@ -0,0 +1,107 @@
+import copy
+
+import pytest
+
+import fraud_rules
+
+
+def rule_set(*rules):
+    return {"rules": list(rules)}
+
+
+def features(**overrides):
+    values = {name: kind() for name, kind in fraud_rules.FEATURES.items()}
+    values.update(overrides)
+    return values
+
+
+def test_default_rules_compile_and_score():
+    ruleset = fraud_rules.compile_rules(copy.deepcopy(fraud_rules.DEFAULT_RULES))
+    score, level, reasons = ruleset.evaluate(
+        features(amount=600000.0, description="paid in cash", claims_30d=2)
+    )
+    assert score == 75.0
+    assert level == "High"
+    assert "Suspicious keywords found: cash" in reasons
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        {"field": "amount", "op": ">", "value": "abc"},
+        {"field": "amount", "op": ">", "value": True},
+        {"field": "claims_30d", "op": ">=", "value": None},
+        {"field": "is_third_party", "op": "==", "value": 1},
+        {"field": "description", "op": "==", "value": 3},
+    ],
+)
+def test_rejects_value_of_wrong_type(condition):
+    with pytest.raises(ValueError, match="does not match the type"):
+        fraud_rules.compile_rules(rule_set({"when": condition, "score": 10}))
+
+
+@pytest.mark.parametrize("keywords", ["cash", [], ["cash", 5], None])
+def test_rejects_contains_any_that_is_not_a_list_of_strings(keywords):
+    condition = {"field": "description", "contains_any": keywords}
+    with pytest.raises(ValueError, match="contains_any"):
+        fraud_rules.compile_rules(rule_set({"when": condition, "score": 10}))
+
+
+@pytest.mark.parametrize("rules", [["x"], [1], [None]])
+def test_rejects_rules_that_are_not_objects(rules):
+    with pytest.raises(ValueError, match="rule must be an object"):
+        fraud_rules.compile_rules({"rules": rules})
+
+
+def test_rejects_cases_that_are_not_objects():
+    with pytest.raises(ValueError, match="case must be an object"):
+        fraud_rules.compile_rules(rule_set({"name": "r", "cases": ["x"]}))
+
+
+@pytest.mark.parametrize("reason", ["{amount:d}", "{description:.2f}", "{} too high", "{amount!x}"])
+def test_rejects_reason_templates_that_fail_to_format(reason):
+    condition = {"field": "amount", "op": ">", "value": 10}
+    with pytest.raises(ValueError, match="invalid reason template"):
+        fraud_rules.compile_rules(rule_set({"when": condition, "score": 10, "reason": reason}))
+
+
+def test_rejects_unknown_placeholder():
+    condition = {"field": "amount", "op": ">", "value": 10}
+    with pytest.raises(ValueError, match="unknown placeholder"):
+        fraud_rules.compile_rules(rule_set({"when": condition, "score": 10, "reason": "{policy}"}))
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"rules": [], "bands": [{"label": "High"}]},
+        {"rules": [], "bands": []},
+        {"rules": [], "max_score": "lots"},
+        rule_set({"when": {"field": "amount", "op": ">", "value": 1}, "score": "ten"}),
+        rule_set({"when": {"all": {"field": "amount", "op": ">", "value": 1}}}),
+    ],
+)
+def test_rejects_malformed_structure(spec):
+    with pytest.raises(ValueError):
+        fraud_rules.compile_rules(spec)
+
+
+def test_contains_any_matches_whole_keywords():
+    condition = {"field": "description", "contains_any": ["cash"]}
+    ruleset = fraud_rules.compile_rules(
+        rule_set({"when": condition, "score": 20, "reason": "Keywords: {hits}"})
+    )
+    assert ruleset.evaluate(features(description="a shed"))[2] == [ruleset.default_reason]
+    assert ruleset.evaluate(features(description="Paid CASH"))[2] == ["Keywords: cash"]
+
+
+def test_invalid_rules_are_not_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(fraud_rules, "RULES_DIR", str(tmp_path))
+    valid = rule_set({"when": {"field": "amount", "op": ">", "value": 10}, "score": 5, "reason": "big"})
+    fraud_rules.save_tenant_rules(7, valid)
+
+    with pytest.raises(ValueError):
+        fraud_rules.save_tenant_rules(7, rule_set({"when": {"field": "amount", "op": ">", "value": "abc"}}))
+
+    assert fraud_rules.get_ruleset(7).spec == valid
+    assert fraud_rules.get_ruleset(7).evaluate(features(amount=20.0))[2] == ["big"]
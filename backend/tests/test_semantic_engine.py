@@ -0,0 +1,45 @@
+import re
+
+import numpy as np
+import pytest
+
+import semantic_engine
+
+
+def test_tokenize_matches_regex_on_the_whole_text():
+    token_re = re.compile(r"[a-z0-9]+")
+    texts = [
+        "",
+        "Invoice No: INV-0042, Total Amount 1,200.00",
+        "naïve CAFÉ İstanbul " * 900,
+        "ab " * 5000,
+        "x" * 20000 + " tail",
+    ]
+    for text in texts:
+        expected = token_re.findall(text.lower())[: semantic_engine.MAX_TOKENS]
+        assert [token.decode() for token in semantic_engine.tokenize(text)] == expected
+
+
+def test_batch_features_match_single_documents():
+    texts = ["claim number 7 water damage", "", "invoice total due invoice"]
+    indices, values, rows = semantic_engine.hash_features_batch(texts)
+    for row, text in enumerate(texts):
+        single_indices, single_values = semantic_engine.hash_features(text)
+        np.testing.assert_array_equal(indices[rows == row], single_indices)
+        np.testing.assert_allclose(values[rows == row], single_values, rtol=1e-6)
+        if len(single_values):
+            assert np.linalg.norm(single_values) == pytest.approx(1.0, rel=1e-5)
+
+
+def test_load_rejects_models_trained_on_other_features(tmp_path):
+    model = semantic_engine.train(
+        ["invoice total amount due", "claim number loss date"] * 4, ["Invoice", "Claim Form"] * 4, epochs=5
+    )
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = semantic_engine.SemanticModel.load(path)
+    assert loaded.predict(["invoice amount due"])[0][0] == "Invoice"
+
+    np.savez(path, labels=np.array(model.labels), weights=model.weights, bias=model.bias)
+    with pytest.raises(ValueError):
+        semantic_engine.SemanticModel.load(path)
@@ -92,54 +92,35 @@ const DocClassification = () => {
   };
 
   const highlightPreview = () => {
-    if (!rawTextPreview || !analysis?.highlight_phrases?.length) {
+    // Server-side offsets (page 1 = the whole text for plain-text uploads)
+    const spans = (analysis?.highlight_spans || []).filter(
+      (s) => s.page === 1 && s.end <= rawTextPreview.length
+    );
+    if (!rawTextPreview || file?.type !== "text/plain" || !spans.length) {
       return rawTextPreview;
     }
 
-    let text = rawTextPreview;
-    const phrases = [...analysis.highlight_phrases].sort(
-      (a, b) => b.length - a.length
-    );
-
-    phrases.forEach((phrase, idx) => {
-      if (!phrase) return;
-      const safePhrase = phrase.replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
-      const re = new RegExp(safePhrase, "gi");
-      text = text.replace(
-        re,
-        (match) => `<<<H${idx}>>>${match}<<<ENDH${idx}>>>`
-      );
-    });
-
-    const parts = text.split(/(<<<H\d+>>>|<<<ENDH\d+>>>)/g);
-    const spans = [];
-    let highlightOn = false;
-    let highlightIndex = 0;
-
-    parts.forEach((part) => {
-      if (part.startsWith("<<<H")) {
-        highlightOn = true;
-        const num = part.match(/\d+/)?.[0];
-        highlightIndex = Number(num || 0);
-        return;
-      }
-      if (part.startsWith("<<<ENDH")) {
-        highlightOn = false;
-        return;
-      }
-      if (!part) return;
-      if (highlightOn) {
-        spans.push(
-          <span key={`${highlightIndex}-${spans.length}`} className="highlight-chip">
-            {part}
-          </span>
+    const parts = [];
+    let cursor = 0;
+    spans.forEach((s, idx) => {
+      if (s.start < cursor) return; // overlaps the previous span
+      if (s.start > cursor) {
+        parts.push(
+          <span key={`plain-${idx}`}>{rawTextPreview.slice(cursor, s.start)}</span>
         );
-      } else {
-        spans.push(<span key={`plain-${spans.length}`}>{part}</span>);
       }
+      parts.push(
+        <span key={`hl-${idx}`} className="highlight-chip" title={s.label}>
+          {rawTextPreview.slice(s.start, s.end)}
+        </span>
+      );
+      cursor = s.end;
     });
+    if (cursor < rawTextPreview.length) {
+      parts.push(<span key="plain-end">{rawTextPreview.slice(cursor)}</span>);
+    }
 
-    return spans;
+    return parts;
   };
 
   const confidencePercent = (analysis?.confidence || 0) * 100;
@@ -9,7 +9,7 @@ const FraudDetection = () => {
     amount: "",
     description: "",
     is_third_party: false,
-    previous_claims_count: 0
+    claimant_id: ""
   });
 
   const [result, setResult] = useState(null);
@@ -39,7 +39,8 @@ const FraudDetection = () => {
       amount: parseFloat(form.amount),
       description: form.description,
       is_third_party: form.is_third_party,
-      previous_claims_count: parseInt(form.previous_claims_count || 0, 10)
+      // Previous claims are counted server-side per claimant
+      claimant_id: form.claimant_id.trim() || null
     };
 
     try {
@@ -129,14 +130,12 @@ const FraudDetection = () => {
           </div>
 
           <div className="form-group">
-            <label>Number of Previous Claims</label>
+            <label>Claimant / Policyholder ID</label>
             <input
-              name="previous_claims_count"
-              type="number"
-              min="0"
-              value={form.previous_claims_count}
+              name="claimant_id"
+              value={form.claimant_id}
               onChange={handleChange}
-              placeholder="0"
+              placeholder="POL-98765"
             />
           </div>
         </div>